@@ -1,5 +1,10 @@
-from celery import Celery
+from celery import Celery, states
+from celery.signals import task_postrun, worker_process_init
+from celery.schedules import crontab
 from dash import CeleryManager
+from cache_manager.cache_manager import CacheManager as cm
+from db_manager.augur_manager import AugurManager, reset_engines
+import logging
 import os
 
 redis_host = "{}".format(os.getenv("REDIS_SERVICE_HOST", "redis-cache"))
@@ -15,6 +20,88 @@ celery_app = Celery(
     backend=REDIS_URL,
 )
 
-celery_app.conf.update(task_time_limit=84600, task_acks_late=True, task_track_started=True)
+# each worker process reserves one task at a time, so a small task isn't
+# held back behind a long one that a busy process prefetched.
+celery_app.conf.update(
+    task_time_limit=84600,
+    task_acks_late=True,
+    task_track_started=True,
+    worker_prefetch_multiplier=1,
+)
+
+# queue of the query tasks of small, interactive selections. Consumed by every
+# query worker, and only by the workers reserved for interactive loads.
+INTERACTIVE_QUEUE = "data"
+
+# queue of the query tasks of large selections, e.g. whole orgs, and of the
+# scheduled refresh and warming. Consumed by the query workers that aren't reserved.
+BULK_QUEUE = "data-bulk"
+
+# hour of the day (UTC) at which cached results are refreshed with newly collected rows.
+REFRESH_HOUR = int(os.getenv("CACHE_REFRESH_HOUR", "4"))
+
+# hour of the day (UTC) at which the results of popular repos and orgs are loaded if they aren't cached.
+WARM_HOUR = int(os.getenv("CACHE_WARM_HOUR", "3"))
+
+# seconds between prunes of expired entries from the cache's eviction bookkeeping.
+PRUNE_SECONDS = int(os.getenv("CACHE_PRUNE_SECONDS", str(60 * 60)))
+
+"""SCHEDULED TASKS, SENT BY THE 'worker-beat' SERVICE"""
+celery_app.conf.timezone = "UTC"
+celery_app.conf.beat_schedule = {
+    "refresh-cache": {
+        "task": "queries.refresh_query.refresh_query",
+        "schedule": crontab(minute=0, hour=REFRESH_HOUR),
+        "options": {"queue": BULK_QUEUE},
+    },
+    "warm-cache": {
+        "task": "queries.warm_query.warm_query",
+        "schedule": crontab(minute=0, hour=WARM_HOUR),
+        "options": {"queue": BULK_QUEUE},
+    },
+    "prune-cache": {
+        "task": "queries.prune_query.prune_query",
+        "schedule": PRUNE_SECONDS,
+        "options": {"queue": BULK_QUEUE},
+    },
+}
 
 celery_manager = CeleryManager(celery_app=celery_app)
+
+
+@task_postrun.connect
+def release_query_leases(task_id=None, task=None, args=None, state=None, **kwargs):
+    """
+    Releases the leases a query task took on fetching its repos' data
+    once it's done, so that a failed fetch can be retried by the next
+    user to search for those repos. Retried tasks keep their leases.
+    """
+    if state not in (states.SUCCESS, states.FAILURE) or not task.name.startswith("queries."):
+        return
+
+    repos = args[0] if args else None
+    if isinstance(repos, list) and repos:
+        cm().releasem(func=task, repos=repos, owner=task_id)
+
+
+@worker_process_init.connect
+def init_db_pool(**kwargs):
+    """
+    Gives each process of a query worker its own pool of database connections,
+    opened once when the process starts rather than by every task.
+    Connections inherited from the parent process aren't used.
+
+    Processes of the other workers, e.g. the callback workers, open their
+    pool on first use, if they ever query the database.
+    """
+    reset_engines()
+
+    # queues selected with -Q, the processes are forked after they're selected.
+    if not {INTERACTIVE_QUEUE, BULK_QUEUE} & set(celery_app.amqp.queues.consume_from):
+        return
+
+    try:
+        AugurManager().get_engine()
+    except Exception as err:
+        # tasks connect on first use and report the failure themselves.
+        logging.error(f"AUGUR: Worker couldn't open its DB pool: {err}")
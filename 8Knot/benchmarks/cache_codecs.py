@@ -0,0 +1,151 @@
+"""
+    Compares the storage codecs of the results cache.
+
+    For each query, samples entries from the running redis-cache, re-encodes them with
+    every codec and reports the stored size and the encode and decode times.
+    Without a reachable cache (or with --synthetic) frames shaped like the
+    commits and contributors results are generated instead.
+
+    Run from the 8Knot directory, e.g. inside the worker-query container:
+
+        python -m benchmarks.cache_codecs --sample 50
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import redis
+from cache_manager import codec
+from cache_manager.cache_manager import CacheManager as cm
+
+
+def synthetic_frames(rows):
+    """Generates frames shaped like the results of the larger queries.
+
+    Args:
+        rows (int): rows per frame
+
+    Returns:
+        dict{str: [pd.DataFrame]}: query name -> frames
+    """
+    rng = np.random.default_rng(0)
+    now = pd.Timestamp("2023-01-01", tz="UTC")
+    stamps = now - pd.to_timedelta(rng.integers(0, 3650 * 86400, rows), unit="s")
+
+    commits = pd.DataFrame(
+        {
+            "commits": [f"{h:040x}" for h in rng.integers(0, 2**63, rows)],
+            "author_email": [f"user{i}@example{i % 50}.com" for i in rng.integers(0, 5000, rows)],
+            "date": stamps.strftime("%Y-%m-%d"),
+            "author_timestamp": stamps.date,
+            "committer_timestamp": stamps,
+        }
+    )
+    contributors = pd.DataFrame(
+        {
+            "id": np.full(rows, 1),
+            "repo_name": "example",
+            "cntrb_id": [f"{i:015d}" for i in rng.integers(0, 5000, rows)],
+            "created_at": stamps.date,
+            "login": [f"user{i}" for i in rng.integers(0, 5000, rows)],
+            "Action": rng.choice(["Commit", "PR Opened", "PR Comment", "Issue Opened", "Issue Comment"], rows),
+            "rank": rng.integers(1, 100, rows),
+        }
+    )
+    return {"commits_query": [commits], "contributors_query": [contributors]}
+
+
+def cached_frames(sample):
+    """Samples entries of every query from the result cache.
+
+    Args:
+        sample (int): maximum number of entries per query
+
+    Returns:
+        dict{str: [pd.DataFrame]}: query name -> frames
+    """
+    r = cm()._redis
+
+    frames = {}
+    for gens_key in r.scan_iter(match="8knot:cache:generations:*"):
+        name = gens_key.decode("utf-8").rsplit(":", 1)[-1]
+
+        keys = []
+        for k in r.scan_iter(match=f"{name}:*", count=1000):
+            keys.append(k)
+            if len(keys) >= sample:
+                break
+
+        # chunks of large entries are sampled like entries, their manifests are skipped.
+        blobs = [b for b in r.mget(keys) if b is not None and not codec.is_manifest(b)] if keys else []
+        if blobs:
+            frames[name] = [codec.decode(b).to_pandas() for b in blobs]
+
+    return frames
+
+
+def benchmark(frames, repeat):
+    """Encodes and decodes every frame with every codec.
+
+    Args:
+        frames (dict{str: [pd.DataFrame]}): query name -> frames
+        repeat (int): number of timed repetitions
+
+    Returns:
+        pd.DataFrame: size and timings per query and codec
+    """
+    rows = []
+    for name, dfs in frames.items():
+        for c in codec.HEADERS:
+            size = 0
+            t_enc = 0.0
+            t_dec = 0.0
+            for df in dfs:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    blob = codec.encode(df, codec=c)
+                    t_enc += time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    codec.decode(blob).to_pandas()
+                    t_dec += time.perf_counter() - start
+                size += len(blob)
+
+            rows.append(
+                {
+                    "query": name,
+                    "codec": c,
+                    "entries": len(dfs),
+                    "MB": size / 2**20,
+                    "encode_ms": 1000 * t_enc / repeat,
+                    "decode_ms": 1000 * t_dec / repeat,
+                }
+            )
+
+    out = pd.DataFrame(rows)
+    if not out.empty:
+        base = out[out["codec"] == "uncompressed"].set_index("query")["MB"]
+        out["ratio"] = out["query"].map(base) / out["MB"]
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=20, help="entries sampled per query")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions")
+    parser.add_argument("--synthetic", action="store_true", help="don't read from the cache")
+    parser.add_argument("--rows", type=int, default=500_000, help="rows per synthetic frame")
+    args = parser.parse_args()
+
+    frames = {}
+    if not args.synthetic:
+        try:
+            frames = cached_frames(args.sample)
+        except redis.exceptions.ConnectionError:
+            print("Couldn't connect to redis-cache, using synthetic data.")
+
+    if not frames:
+        frames = synthetic_frames(args.rows)
+
+    with pd.option_context("display.width", 120, "display.float_format", "{:.2f}".format):
+        print(benchmark(frames, args.repeat).to_string(index=False))
@@ -0,0 +1,167 @@
+"""
+    Compares the ways AugurManager can extract a query's results.
+
+    Loads synthetic commits-shaped rows into a table of a Postgres database,
+    then reads them back with:
+
+        read_sql: run_query, pd.read_sql on the whole result
+        stream:   stream_query, Arrow batches from a server-side cursor
+        copy:     copy_query, COPY ... TO STDOUT parsed by Arrow's CSV reader
+
+    Each method runs in a fresh process, which reports its latency and the
+    peak memory it used, and converts its result to the DataFrame that query
+    tasks work on so that the methods are compared on equal terms.
+
+    Run from the 8Knot directory against a scratch database, e.g. a local
+    Postgres container. The table is created and dropped by the benchmark:
+
+        python -m benchmarks.db_extract --url postgresql+psycopg2://postgres@localhost/postgres --rows 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+import pandas as pd
+import pyarrow as pa
+import sqlalchemy as salc
+from db_manager.augur_manager import AugurManager
+
+METHODS = ["read_sql", "stream", "copy"]
+
+TABLE = "bench_extract_commits"
+
+QUERY = f"""
+        SELECT
+            repo_id AS id,
+            cmt_commit_hash AS commits,
+            cmt_author_email AS author_email,
+            cmt_author_date AS date,
+            cmt_author_timestamp AS author_timestamp,
+            cmt_committer_timestamp AS committer_timestamp
+        FROM {TABLE}
+        WHERE repo_id = ANY(:repo_ids)
+        """
+
+COLUMN_TYPES = {"commits": pa.string(), "author_email": pa.string(), "date": pa.string()}
+
+
+def load(url, rows, repos):
+    """Creates the table of synthetic commits in the database.
+
+    Args:
+        url (str): SQLAlchemy URL of the database
+        rows (int): number of rows
+        repos (int): number of repos the rows belong to
+    """
+    engine = salc.create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.exec_driver_sql(
+            f"""
+            CREATE TABLE {TABLE} AS
+            SELECT
+                mod(i, {repos}) + 1 AS repo_id,
+                md5(i::text) || substr(md5((i + 1)::text), 1, 8) AS cmt_commit_hash,
+                'user' || mod(i, 5000) || '@example.com' AS cmt_author_email,
+                to_char(ts, 'YYYY-MM-DD') AS cmt_author_date,
+                ts AS cmt_author_timestamp,
+                ts + interval '1 hour' AS cmt_committer_timestamp
+            FROM (
+                SELECT i, timestamptz '2013-01-01' + mod(i::bigint * 7919, 315360000) * interval '1 second' AS ts
+                FROM generate_series(1, {rows}) AS i
+            ) s
+            """
+        )
+        conn.exec_driver_sql(f"ANALYZE {TABLE}")
+    engine.dispose()
+
+
+def drop(url):
+    """Drops the table of synthetic commits."""
+    engine = salc.create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {TABLE}")
+    engine.dispose()
+
+
+def _rss():
+    """
+    (private)
+    Resident memory of this process, in bytes.
+    """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _run(method, url, repos, out):
+    """
+    (private)
+    Extracts the table with method, in its own process.
+    """
+    # credentials come from the URL rather than the environment.
+    dbm = AugurManager.__new__(AugurManager)
+    dbm.engine = salc.create_engine(url)
+    with dbm.engine.connect():
+        pass
+
+    params = {"repo_ids": list(range(1, repos + 1))}
+
+    base = _rss()
+    start = time.perf_counter()
+
+    if method == "read_sql":
+        df = dbm.run_query(QUERY, params=params)
+    elif method == "stream":
+        df = pa.Table.from_batches(list(dbm.stream_query(QUERY, params=params))).to_pandas()
+    else:
+        df = dbm.copy_query(QUERY, params=params, column_types=COLUMN_TYPES).to_pandas()
+
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    out.put((elapsed, peak - base, len(df)))
+
+
+def benchmark(url, repos, repeat):
+    """Extracts the table with every method.
+
+    Args:
+        url (str): SQLAlchemy URL of the database
+        repos (int): number of repos the rows belong to
+        repeat (int): number of timed repetitions
+
+    Returns:
+        pd.DataFrame: latency and peak memory per method
+    """
+    ctx = multiprocessing.get_context("spawn")
+
+    rows = []
+    for method in METHODS:
+        for _ in range(repeat):
+            out = ctx.Queue()
+            p = ctx.Process(target=_run, args=(method, url, repos, out))
+            p.start()
+            elapsed, peak, n = out.get()
+            p.join()
+            rows.append({"method": method, "rows": n, "ms": 1000 * elapsed, "peak_MB": peak / 2**20})
+
+    # best of the repetitions
+    return pd.DataFrame(rows).groupby("method", sort=False).min().reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="SQLAlchemy URL of a scratch Postgres database")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows extracted")
+    parser.add_argument("--repos", type=int, default=100, help="repos the rows belong to")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions")
+    args = parser.parse_args()
+
+    load(args.url, args.rows, args.repos)
+    try:
+        with pd.option_context("display.width", 120, "display.float_format", "{:.1f}".format):
+            print(benchmark(args.url, args.repos, args.repeat).to_string(index=False))
+    finally:
+        drop(args.url)
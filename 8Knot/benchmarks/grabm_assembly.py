@@ -0,0 +1,140 @@
+"""
+    Compares the ways grabm can assemble the results of many repos.
+
+    Encodes synthetic commits results for each repo of an org-sized selection
+    in the cache's storage format, then decodes and assembles them:
+
+        pandas: each entry converted to a DataFrame, then pd.concat
+        arrow:  entries concatenated as Arrow Tables, converted to pandas once
+        table:  entries concatenated as Arrow Tables, not converted
+
+    Each method runs in a fresh process, which reports its latency and the
+    peak memory it used on top of the encoded entries.
+
+    Run from the 8Knot directory:
+
+        python -m benchmarks.grabm_assembly --repos 1000
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import resource
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from cache_manager import codec
+from cache_manager.cache_manager import CacheManager as cm
+
+METHODS = ["pandas", "arrow", "table"]
+
+
+def synthetic_entries(repos, rows):
+    """Encodes commits-shaped results for each repo.
+
+    Args:
+        repos (int): number of repos
+        rows (int): mean rows per repo, sizes vary like real repos do
+
+    Returns:
+        list[bytes]: encoded entry of each repo
+    """
+    rng = np.random.default_rng(0)
+    now = pd.Timestamp("2023-01-01", tz="UTC")
+
+    entries = []
+    for n in rng.geometric(1 / rows, repos):
+        stamps = now - pd.to_timedelta(rng.integers(0, 3650 * 86400, n), unit="s")
+        df = pd.DataFrame(
+            {
+                "commits": [f"{h:040x}" for h in rng.integers(0, 2**63, n)],
+                "author_email": [f"user{i}@example.com" for i in rng.integers(0, 5000, n)],
+                "date": stamps.strftime("%Y-%m-%d"),
+                "author_timestamp": stamps.date,
+                "committer_timestamp": stamps,
+            }
+        )
+        entries.append(codec.encode(df))
+    return entries
+
+
+def _rss():
+    """
+    (private)
+    Resident memory of this process, in bytes.
+    """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _run(method, path, out):
+    """
+    (private)
+    Assembles the entries stored at path with method, in its own process.
+    """
+    with open(path, "rb") as f:
+        entries = pickle.load(f)
+
+    base = _rss()
+    start = time.perf_counter()
+
+    tables = [codec.decode(b) for b in entries]
+    if method == "pandas":
+        result = pd.concat([t.to_pandas() for t in tables])
+    else:
+        table = cm()._concat(tables)
+        result = table.to_pandas(split_blocks=True) if method == "arrow" else table
+
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    out.put((elapsed, peak - base, len(result)))
+
+
+def benchmark(entries, repeat):
+    """Assembles the entries with every method.
+
+    Args:
+        entries (list[bytes]): encoded entry of each repo
+        repeat (int): number of timed repetitions
+
+    Returns:
+        pd.DataFrame: latency and peak memory per method
+    """
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as f:
+        pickle.dump(entries, f)
+        path = f.name
+
+    rows = []
+    try:
+        for method in METHODS:
+            for _ in range(repeat):
+                out = ctx.Queue()
+                p = ctx.Process(target=_run, args=(method, path, out))
+                p.start()
+                elapsed, peak, n = out.get()
+                p.join()
+                rows.append({"method": method, "rows": n, "ms": 1000 * elapsed, "peak_MB": peak / 2**20})
+    finally:
+        os.remove(path)
+
+    # best of the repetitions
+    return pd.DataFrame(rows).groupby("method", sort=False).min().reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repos", type=int, default=1000, help="repos in the selection")
+    parser.add_argument("--rows", type=int, default=2000, help="mean rows per repo")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions")
+    args = parser.parse_args()
+
+    entries = synthetic_entries(args.repos, args.rows)
+    print(f"{len(entries)} entries, {sum(map(len, entries)) / 2**20:.1f} MB encoded")
+
+    with pd.option_context("display.width", 120, "display.float_format", "{:.1f}".format):
+        print(benchmark(entries, args.repeat).to_string(index=False))
@@ -1,8 +1,136 @@
-import redis
 import os
+import time
 import hashlib
+import inspect
+import json
+import logging
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import io
+import pyarrow as pa
+from cache_manager import codec
+from cache_manager.local_cache import local_cache
+from cache_manager.spill import spill_store
+from cache_manager.connections import cache_client
+
+# Keys used to keep track of the size and recency of each cached (func, repo) entry.
+# These are what the memory-budget eviction works from.
+ACCESS_TIME_KEY = "8knot:cache:atime"
+ACCESS_COUNT_KEY = "8knot:cache:hits"
+ENTRY_SIZE_KEY = "8knot:cache:size"
+TOTAL_SIZE_KEY = "8knot:cache:bytes"
+
+# Version stamp of each entry, rewritten whenever the entry is. Expires with
+# the entry. Lets processes validate their decoded copies of entries cheaply.
+STAMP_KEY = "8knot:cache:stamp:{}"
+
+# Results larger than this (in megabytes, uncompressed) are split into chunks of
+# rows of about this size, stored under their own keys next to a manifest.
+# Keeps every value well below Redis' 512MB limit and keeps single commands short.
+CHUNK_MB = int(os.getenv("CACHE_CHUNK_MB", "64"))
+
+# key of the i-th chunk of an entry, written by the write with the given stamp.
+# A write never overwrites the chunks of another, so readers of the previous
+# manifest don't see a mix of old and new chunks.
+CHUNK_KEY = "{}:chunk:{}:{}"
+
+# Seconds the chunks of a value are kept after it's overwritten, so that
+# readers that fetched its manifest just before can still read them.
+CHUNK_GRACE = 60
+
+# "<stamp>:<number of chunks>" of each chunked entry
+ENTRY_CHUNKS_KEY = "8knot:cache:chunks"
+
+# number of entries (or chunks) fetched per round trip when reading.
+READ_BATCH = 16
+
+# threads that serialize the entries of a write. Arrow compresses without
+# holding the GIL, so entries are encoded in parallel while earlier ones are
+# sent to Redis. 1 serializes them one at a time.
+SERIALIZE_THREADS = int(os.getenv("CACHE_SERIALIZE_THREADS", str(os.cpu_count() or 1)))
+
+# Hash of the high-water mark of each entry: the time up to which rows changed
+# in the database are in the entry. Only set by queries that can be refreshed
+# incrementally, which fetch the rows changed since then and merge them in.
+WATERMARK_KEY = "8knot:cache:watermark"
+
+# Channel on which the keys of newly written results of a query are published.
+READY_CHANNEL = "8knot:cache:ready:{}"
+
+# Seconds 'wait' blocks for by default.
+WAIT_TIMEOUT = 60
+
+# Seconds between re-checks of the stamps while waiting, in case a notification was missed.
+WAIT_RECHECK = 15
+
+# Lease on fetching the results of a query for a repo, held by the id of the task fetching them.
+# Makes sure only one task queries the database for any (func, repo) at a time.
+LEASE_KEY = "8knot:cache:lease:{}"
+
+# Seconds a lease is held at most, in case its task dies without releasing it.
+LEASE_TTL = int(os.getenv("CACHE_LEASE_SECONDS", str(60 * 60)))
+
+# Sorted set of how often repos ("repo:<id>") and orgs ("org:<name>") are searched
+# for, decayed every time the cache is warmed so that recent searches count most.
+POPULARITY_KEY = "8knot:cache:popular"
+
+# factor the search counts are multiplied by at every decay.
+POPULARITY_DECAY = 0.5
+
+# Upper bound on the memory the result cache may use, in megabytes.
+# When a write takes the cache over budget, least-recently (or least-frequently)
+# used entries are evicted until it fits again. 0 disables the budget.
+# The default fits the shipped redis-cache, which is limited to 4Gi.
+MEMORY_BUDGET_MB = int(os.getenv("CACHE_MEMORY_BUDGET_MB", "2048"))
+
+# "lru" or "lfu"
+EVICTION_POLICY = os.getenv("CACHE_EVICTION_POLICY", "lru").lower()
+
+# Default number of seconds a cached entry lives before it expires and
+# is re-queried. A query module can set its own default with a module-level
+# CACHE_TTL, and either can be overridden per query with
+# CACHE_TTL_<QUERY_FUNCTION_NAME>, e.g. CACHE_TTL_COMMITS_QUERY=3600. 0 disables expiry.
+DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", str(60 * 60 * 24 * 7)))
+
+# number of eviction candidates considered per round trip to Redis.
+EVICTION_BATCH = 16
+
+# factor the access counts are multiplied by at every decay, so that LFU eviction
+# keeps entries that are used often now over ones that were used often long ago.
+ACCESS_COUNT_DECAY = 0.9
+
+# Entries that expire stay in the eviction bookkeeping until they're pruned.
+# A process over budget prunes at most once per this many seconds before evicting,
+# so that the sizes of expired entries don't cause live ones to be evicted.
+PRUNE_INTERVAL = 60 * 5
+
+# Per query function, a sorted set of the versions of that query that are
+# in use, scored by when a process last used them. Versions that haven't been
+# used for GENERATION_GRACE seconds are garbage-collected.
+GENERATIONS_KEY = "8knot:cache:generations:{}"
+
+# Seconds an unused version of a query is kept before its entries are deleted.
+# Covers rolling deploys, where old and new versions of a query are both live.
+GENERATION_GRACE = int(os.getenv("CACHE_GENERATION_GRACE", str(60 * 60)))
+
+# how often (seconds) a process re-announces that it uses its version of a query.
+GENERATION_HEARTBEAT = 60
+
+# number of keys inspected per garbage-collection step.
+GC_BATCH = 500
+
+# query function name -> version fingerprint, computed once per process.
+_versions = {}
+
+# query function name -> when this process last announced its version.
+_heartbeats = {}
+
+# when this process last pruned the eviction bookkeeping.
+_last_prune = 0
+
+# key -> stamp of the results read by 'grabm' in the current context, while it's recorded.
+_reads = contextvars.ContextVar("cache_reads", default=None)
 
 
 class CacheManager:
@@ -15,15 +143,19 @@ class CacheManager:
 
     Methods
     -------
+        _get_version(func) (private) :
+            Creates a fingerprint of the query's definition (SQL and output columns).
+
         _get_hash(func, repo) (private) :
-            Creates a unique hash for each job based on the job's calling
-            function and the list of repos that the function is being run with.
+            Creates a unique key for each job based on the job's calling
+            function, the version of that function and the repo it's being run with.
 
-        set(func, repo, data) :
-            Sets data at key hash(func, repo).
+        set(func, repo, data, ttl) :
+            Sets data at key hash(func, repo), expiring after ttl seconds.
 
-        setm(func, [repo], [data]) :
-            Sets [data] at keys [hash(func, repo)] of [repo]
+        setm(func, [repo], [data], ttl, [watermark]) :
+            Sets [data] at keys [hash(func, repo)] of [repo], expiring after ttl seconds.
+            Evicts cold entries if the write takes the cache over its memory budget.
 
         get(func, repo):
             Returns data at key hash(func, repo), None if Nil.
@@ -38,91 +170,421 @@ class CacheManager:
         existsm(func, [repo]):
             Returns number of names that exist.
 
+        missingm([func], [repo], touch, promote):
+            Returns repos whose results aren't cached, per func, in one round trip.
+            Optionally promotes results that were demoted to disk back into Redis.
+
+        count_search([repo], [org]):
+            Counts a search towards the popularity of repos and orgs.
+
+        popular(n):
+            Returns the n most searched for repos and orgs.
+
+        decay_popularity(factor):
+            Scales down search counts so that recent searches weigh most.
+
+        prune():
+            Removes entries that expired from the eviction bookkeeping.
+
+        decay_access_counts(factor):
+            Scales down access counts so that recent use weighs most for LFU eviction.
+
+        touchm(func, [repo]):
+            Marks entries as recently used so that they're evicted last.
+
+        stampsm([func], [repo]):
+            Returns the version stamps of results, None if any is missing.
+
+        recording(), recorded_stampsm(reads, [func], [repo]):
+            Record the version stamps of the results that grabm reads, and look them up.
+
+        get_blob(key), set_blob(key, blob, ttl):
+            Get and set values cached alongside the results, evicted like them.
+
+        leasem(func, [repo], owner):
+            Takes leases on fetching results for repos that no other task is fetching.
+
+        releasem(func, [repo], owner):
+            Releases leases held by owner.
+
+        wait(func, [repo], timeout, leased):
+            Blocks until entries of all repos exist, or timeout passes.
+
+        watermarks(func):
+            Returns the high-water mark of each cached result of the query.
+
+        mergem(func, [repo], [data], key, [watermark]):
+            Merges rows that changed since the entries were cached into them.
+
+        grabm(func, [repo], [column], as_arrow):
+            Returns aggregate DataFrame (or Arrow Table) of entries if all are available, None otherwise.
+            Only decodes the requested columns. Promotes results that were demoted to disk.
+
     """
 
     def __init__(self, decode_value=False):
-        # Redis cache for job queue and results cache
-        self._redis = redis.StrictRedis(
-            # openshift, compose will reconcile the 'redis' naming via the dns
-            host=os.getenv("REDIS_SERVICE_HOST", "redis-cache"),
-            port=os.getenv("REDIS_SERVICE_PORT", "6379"),
-            password=os.getenv("REDIS_PASSWORD", ""),
-            decode_responses=decode_value,
-        )
+        # Redis cache for job queue and results cache, on the process' shared pool
+        self._redis = cache_client(decode_responses=decode_value)
 
-    def _get_hash(self, func, repo):
+    def _get_version(self, func):
         """
         (private)
-        Creates an MD5-hash based on the string-bytes
-        of the passed function and the list of repos that
-        the function is going to be run on.
+        Creates a fingerprint of the definition of a query.
 
-        Hash is used as a key by which the status of and results from the
-        worker are accessed from the Queue.
+        The fingerprint is an MD5-hash of the source of the module that
+        defines the query, which contains its SQL text and the post-processing
+        that determines the columns of its output, and of the modules of its
+        package that it imports helpers from (e.g. queries/query_utils.py,
+        which compacts the column types). Changing any of them changes the
+        fingerprint, so results cached by a previous version of the query
+        aren't served after a deploy.
 
         Args:
         -----
-            func (function): Function that worker picks up to run as job.
-            repo (str): Argument to function. Repo data downloaded for.
+            func (function): Query function used
 
         Returns:
         --------
-            _Hash: Unique key in Queue object to access job status and results.
+            str: short hex fingerprint of the query's definition.
         """
+        name = func.__name__
+        if name in _versions:
+            return _versions[name]
+
+        # celery tasks keep the decorated function at 'run'.
+        fn = getattr(func, "run", func)
 
         # use md5 instead of sha256 or better because
         # we're only ensuring limited collision avoidance, not
         # practicing good securiy protocol.
         hashfunc = hashlib.md5()
+        try:
+            for module in self._get_sources(fn):
+                hashfunc.update(bytes(inspect.getsource(module), "utf-8"))
+        except (OSError, TypeError):
+            # source isn't available, fall back to a stable per-name version.
+            logging.warning(f"CACHE: NO SOURCE FOR {name}, CAN'T VERSION ITS RESULTS")
+            hashfunc.update(bytes(name, "utf-8"))
+
+        _versions[name] = hashfunc.hexdigest()[:12]
+        return _versions[name]
+
+    def _get_sources(self, fn):
+        """
+        (private)
+        Modules that define the output of a query: the module of the query
+        and the modules of the same package that it imports from.
+
+        Args:
+        -----
+            fn (function): undecorated query function
+
+        Returns:
+        --------
+            [module]: the query's module first, then its helpers by name.
+        """
+        module = inspect.getmodule(fn)
+        if module is None:
+            raise TypeError(f"{fn!r} has no module")
+
+        package = module.__name__.rpartition(".")[0]
+        helpers = {}
+        if package:
+            for value in vars(module).values():
+                # objects of other packages (and builtins) aren't part of the query.
+                helper = value if inspect.ismodule(value) else inspect.getmodule(value)
+                if helper is None or helper is module:
+                    continue
+                if helper.__name__.startswith(package + "."):
+                    helpers[helper.__name__] = helper
+
+        return [module] + [helpers[name] for name in sorted(helpers)]
+
+    def _get_hash(self, func, repo):
+        """
+        (private)
+        Creates the key for the results of a query for a repo.
 
-        # use the called function's name
-        hashfunc.update(bytes(func.__name__, "utf-8"))
+        Keys are of the form "<function name>:<query version>:<repo>", so that
+        changing a query's definition invalidates only that query's entries
+        and the entries of one version of a query can be found by prefix.
 
-        # and the repo list we're passing to it
-        hashfunc.update(bytes(str(repo), "utf-8"))
-        # grab the hex hash that's been generated.
-        h = hashfunc.hexdigest()
+        Args:
+        -----
+            func (function): Function that worker picks up to run as job.
+            repo (str): Argument to function. Repo data downloaded for.
+
+        Returns:
+        --------
+            str: Unique key in Redis to access results.
+        """
+        return f"{func.__name__}:{self._get_version(func)}:{repo}"
+
+    def _announce_version(self, func):
+        """
+        (private)
+        Records that this process uses its version of 'func' and
+        garbage-collects a batch of keys of versions nobody has used
+        for longer than the grace period.
 
-        return h
+        Called on writes, so old generations are removed lazily as
+        the new version of a query fills the cache.
 
-    def set(self, func, repo, data):
+        Args:
+        -----
+            func (function): Query function used
+        """
+        name = func.__name__
+        now = time.time()
+        gens_key = GENERATIONS_KEY.format(name)
+
+        if now - _heartbeats.get(name, 0) > GENERATION_HEARTBEAT:
+            self._redis.zadd(gens_key, {self._get_version(func): now})
+            _heartbeats[name] = now
+
+        stale = self._redis.zrangebyscore(gens_key, "-inf", now - GENERATION_GRACE, start=0, num=2)
+        stale = [v.decode("utf-8") if isinstance(v, bytes) else v for v in stale]
+
+        # never collect the version this process is writing.
+        stale = [v for v in stale if v != self._get_version(func)]
+        if not stale:
+            return
+
+        version = stale[0]
+
+        # one SCAN step per write, resuming where the previous step ended.
+        cursor_key = f"{gens_key}:{version}:cursor"
+        cursor = int(self._redis.get(cursor_key) or 0)
+        cursor, keys = self._redis.scan(cursor=cursor, match=f"{name}:{version}:*", count=GC_BATCH)
+        if keys:
+            self._forget([k.decode("utf-8") if isinstance(k, bytes) else k for k in keys])
+
+        if cursor == 0:
+            # whole keyspace covered, this version is gone.
+            self._redis.zrem(gens_key, version)
+            self._redis.delete(cursor_key)
+            logging.warning(f"CACHE: COLLECTED VERSION {version} OF {name}")
+        else:
+            self._redis.set(cursor_key, cursor)
+
+    def _get_ttl(self, func):
+        """
+        (private)
+        Number of seconds that results of 'func' should be cached for.
+
+        Args:
+        -----
+            func (function): Query function used
+
+        Returns:
+        --------
+            int | None: seconds until expiry, None if results shouldn't expire.
+        """
+        # celery tasks keep the decorated function at 'run'.
+        module = inspect.getmodule(getattr(func, "run", func))
+        default = getattr(module, "CACHE_TTL", DEFAULT_TTL)
+        ttl = int(os.getenv(f"CACHE_TTL_{func.__name__.upper()}", default))
+
+        # redis rejects non-positive expiry times
+        return ttl if ttl > 0 else None
+
+    def set(self, func, repo, data, ttl=None):
         """Sets redis value as data at name=hash(func, repo)
 
         Args:
             func (function): Query function used
             repo (int): repo_id of repo
-            data (list(dict)): rows of data in dictionary format.
+            data (pd.DataFrame | bytes): results for the repo, or already serialized results.
+            ttl (int | None): seconds until the value expires. Defaults to the query's TTL.
 
         Returns:
             boolean: confirmation of successful set operation.
         """
 
-        # set redis value at 'name=hash' to 'data'
-        ack = self._redis.set(name=self._get_hash(func=func, repo=repo), value=data)
-
-        return ack
+        # pass to setm, processes as a list.
+        return self.setm(func, [repo], [data], ttl=ttl)
 
-    def setm(self, func, repos, datas):
+    def setm(self, func, repos, datas, ttl=None, watermarks=None):
         """Sets many redis value as data at name=hash(func, repo)
 
+        Frames are stored in the compressed Arrow format of 'codec'.
+        Each value expires after 'ttl' seconds. Size and access time of each
+        entry are recorded so that the cache can be held to its memory budget.
+
         Args:
             func (function): Query function used
             repo (list[int]): list of repo_ids of repos
-            data (list[list(dict)]): list of rows of data in dictionary format.
+            data (list[pd.DataFrame | pa.Table | bytes]): results for each repo, or already serialized results.
+            ttl (int | None): seconds until the values expire. Defaults to the query's TTL.
+            watermarks (list[str | None] | None): high-water mark of the results for each repo.
 
         Returns:
-            list[boolean]: confirmations of successful set operations.
+            boolean: confirmation of successful set operations.
         """
 
         # create hashes for each (func, repo_id) pair
         hs = [self._get_hash(func, r) for r in repos]
-        ds = datas
 
-        # bulk-set keys to values in Redis
-        acks = self._redis.mset(dict(zip(hs, ds)))
+        if not hs:
+            return True
+
+        if ttl is None:
+            ttl = self._get_ttl(func)
+
+        self._announce_version(func)
+
+        # stamps of the new values, chunks are written under them.
+        stamps = [os.urandom(8).hex() for _ in hs]
+
+        # size and chunks of entries that are being overwritten, if any
+        old_sizes = self._redis.hmget(ENTRY_SIZE_KEY, hs)
+        old_chunks = self._redis.hmget(ENTRY_CHUNKS_KEY, hs)
+
+        # MSET can't set an expiry, and one MSET of every value would
+        # block Redis for as long as it takes to write all of them, so
+        # values are set in non-transactional pipelines of bounded size.
+        pipe = self._redis.pipeline(transaction=False)
+        pending = 0
+        acks = []
+        num_sets = len(hs)
+        new_sizes = {}
+        new_chunks = {}
+        superseded = []
+        for (h, parts), stamp, old in zip(self._encoded(hs, datas, stamps), stamps, old_chunks):
+            size = 0
+            n = 0
+            for k, v in parts:
+                pipe.set(name=k, value=v, ex=ttl)
+                num_sets += 1
+                size += len(v)
+                pending += len(v)
+                if k != h:
+                    n += 1
 
-        # from redis docs: "(Return is) always OK since MSET can't fail."
-        return acks
+                if pending > CHUNK_MB * 1024 * 1024:
+                    acks += pipe.execute()
+                    pending = 0
+
+            # chunks of the previous value expire once its manifest is replaced.
+            if old is not None:
+                superseded += self._chunk_keys(h, old)
+
+            new_sizes[h] = size
+            if n:
+                new_chunks[h] = f"{stamp}:{n}"
+
+        delta = sum(new_sizes.values()) - sum(int(s) for s in old_sizes if s is not None)
+
+        # stamps are written last, the entries are ready once they exist.
+        now = time.time()
+        for h, stamp in zip(hs, stamps):
+            pipe.set(name=STAMP_KEY.format(h), value=stamp, ex=ttl)
+        pipe.hset(ENTRY_SIZE_KEY, mapping=new_sizes)
+        if len(new_chunks) < len(hs):
+            pipe.hdel(ENTRY_CHUNKS_KEY, *[h for h in hs if h not in new_chunks])
+        if new_chunks:
+            pipe.hset(ENTRY_CHUNKS_KEY, mapping=new_chunks)
+        marks = {h: w for h, w in zip(hs, watermarks or []) if w is not None}
+        if marks:
+            pipe.hset(WATERMARK_KEY, mapping=marks)
+        pipe.zadd(ACCESS_TIME_KEY, {h: now for h in hs})
+        pipe.zadd(ACCESS_COUNT_KEY, {h: 1 for h in hs}, nx=True)
+        pipe.incrby(TOTAL_SIZE_KEY, delta)
+        pipe.publish(READY_CHANNEL.format(func.__name__), json.dumps(hs))
+        acks += pipe.execute()
+
+        if superseded:
+            pipe = self._redis.pipeline(transaction=False)
+            for k in superseded:
+                pipe.expire(k, CHUNK_GRACE)
+            pipe.execute()
+
+        # copies demoted to disk are superseded by what we just wrote.
+        if spill_store.enabled:
+            spill_store.discard(hs)
+
+        # the entries we just wrote are never the ones evicted to make room for them.
+        self._enforce_budget(protected=set(hs))
+
+        # SET replies True, the other commands reply with counts.
+        return sum(a is True for a in acks) == num_sets
+
+    def _encoded(self, hs, datas, stamps):
+        """
+        (private)
+        Serializes entries on SERIALIZE_THREADS threads, in order.
+
+        At most twice as many entries as there are threads are serialized
+        ahead of the one being written, so the memory used stays bounded
+        however many entries are written at once.
+
+        Args:
+        -----
+            hs (list[str]): keys of the entries
+            datas (list[pd.DataFrame | pa.Table | bytes]): results of each entry
+            stamps (list[str]): stamp of the new value of each entry
+
+        Yields:
+        -------
+            (str, list[(str, bytes)]): key of each entry and the keys and values to set for it.
+        """
+        if SERIALIZE_THREADS <= 1 or len(hs) <= 1:
+            for h, d, st in zip(hs, datas, stamps):
+                yield h, list(self._serialize(h, d, st))
+            return
+
+        window = 2 * SERIALIZE_THREADS
+        with ThreadPoolExecutor(max_workers=SERIALIZE_THREADS) as pool:
+            pending = []
+            for h, d, st in zip(hs, datas, stamps):
+                pending.append((h, pool.submit(lambda h, d, st: list(self._serialize(h, d, st)), h, d, st)))
+                if len(pending) >= window:
+                    h0, f = pending.pop(0)
+                    yield h0, f.result()
+
+            for h, f in pending:
+                yield h, f.result()
+
+    def _serialize(self, h, data, stamp):
+        """
+        (private)
+        Serializes the results for one entry, splitting them into
+        chunks of rows if they are larger than CHUNK_MB.
+
+        Args:
+        -----
+            h (str): key of the entry
+            data (pd.DataFrame | pa.Table | bytes): results, or already serialized results.
+            stamp (str): stamp of the new value, the chunks are keyed by it.
+
+        Yields:
+        -------
+            (str, bytes): keys and values to set. For chunked results the chunks
+                come first and the manifest, at key 'h', last.
+        """
+
+        # bytes are assumed to already be serialized.
+        if isinstance(data, bytes):
+            yield h, data
+            return
+
+        if isinstance(data, pd.DataFrame):
+            data = pa.Table.from_pandas(data, preserve_index=False)
+
+        data = self._wide_dictionaries(data)
+
+        chunk_bytes = CHUNK_MB * 1024 * 1024
+        if data.nbytes <= chunk_bytes or data.num_rows <= 1:
+            yield h, codec.encode(data)
+            return
+
+        # slices share the buffers of the table, only the encoded chunks are new.
+        rows = max(1, data.num_rows * chunk_bytes // data.nbytes)
+        offsets = range(0, data.num_rows, rows)
+        for i, offset in enumerate(offsets):
+            yield CHUNK_KEY.format(h, stamp, i), codec.encode(data.slice(offset, rows))
+
+        yield h, codec.encode_manifest(len(offsets), data.num_rows, stamp)
 
     def get(self, func, repo):
         """Get redis value as data at name=hash(func, repo)
@@ -136,7 +598,11 @@ class CacheManager:
         """
 
         # get redis value at "name=hash"
-        r = self._redis.get(name=self._get_hash(func, repo))
+        h = self._get_hash(func, repo)
+        r = self._redis.get(name=h)
+
+        if r is not None:
+            self._touch([h])
 
         return r
 
@@ -157,6 +623,8 @@ class CacheManager:
         # bulk-get values from keys in Redis
         rs = self._redis.mget(hs)
 
+        self._touch([h for h, r in zip(hs, rs) if r is not None])
+
         # return results
         return rs
 
@@ -197,33 +665,865 @@ class CacheManager:
         # return results
         return n
 
-    def grabm(self, func, repos):
-        """Checks to see if data is ready using 'existsm'
-        and builds aggregate DataFrame to return to callback.
+    def missingm(self, funcs, repos, touch=False, promote=False):
+        """Finds the results that aren't in the cache for every
+        (func, repo) pair, in one round trip to Redis.
+
+        Args:
+            funcs (list[function]): Query functions used
+            repos (list[int]): list of repo_ids of repos
+            touch (bool): mark the results that are cached as used.
+            promote (bool): move results that were demoted to disk back into
+                Redis, they aren't missing then.
+
+        Returns:
+            dict{function: list[int]}: repo_ids whose results are missing, per function.
+        """
+        pairs = [(f, r) for f in funcs for r in repos]
+        hs = [self._get_hash(f, r) for f, r in pairs]
+
+        # every entry has a stamp while it exists
+        stamps = self._redis.mget([STAMP_KEY.format(h) for h in hs]) if hs else []
+
+        missing = {f: [] for f in funcs}
+        for (f, r), st in zip(pairs, stamps):
+            if st is None:
+                missing[f].append(r)
+
+        if touch:
+            self._touch([h for h, st in zip(hs, stamps) if st is not None])
+
+        if promote:
+            for f in funcs:
+                promoted = set(self._promote(f, missing[f]))
+                missing[f] = [r for r in missing[f] if r not in promoted]
+
+        return missing
+
+    def stampsm(self, funcs, repos):
+        """Version stamps of the results of every (func, repo) pair.
+
+        A stamp changes whenever its result is rewritten, so the stamps
+        identify the data that anything derived from the results was built from.
+
+        Args:
+            funcs (list[function]): Query functions used
+            repos (list[int]): list of repo_ids of repos
+
+        Returns:
+            list[str] | None: stamp of each pair, None if any result is missing.
+        """
+        hs = [self._get_hash(f, r) for f in funcs for r in repos]
+        stamps = self._redis.mget([STAMP_KEY.format(h) for h in hs]) if hs else []
+        if any(st is None for st in stamps):
+            return None
+        return [st.decode("utf-8") for st in stamps]
+
+    @contextlib.contextmanager
+    def recording(self):
+        """Records the version stamps of the results that grabm reads
+        within the context, checked before the results were read. So
+        anything built from the results is never newer than their stamps.
+
+        Yields:
+            dict{str: str}: key -> stamp of each result read so far.
+        """
+        reads = {}
+        token = _reads.set(reads)
+        try:
+            yield reads
+        finally:
+            _reads.reset(token)
+
+    def recorded_stampsm(self, reads, funcs, repos):
+        """Version stamps of the results of every (func, repo) pair, as they were read.
+
+        Args:
+            reads (dict{str: str}): stamps recorded by 'recording'
+            funcs (list[function]): Query functions used
+            repos (list[int]): list of repo_ids of repos
+
+        Returns:
+            list[str] | None: stamp of each pair, None if any result wasn't read.
+        """
+        stamps = [reads.get(self._get_hash(f, r)) for f in funcs for r in repos]
+        if any(st is None for st in stamps):
+            return None
+        return stamps
+
+    def get_blob(self, key):
+        """Gets a value cached alongside the results, e.g. a rendered figure,
+        and marks it as used.
+
+        Args:
+            key (str): key of the value
+
+        Returns:
+            bytes | None: the value, None if it isn't cached.
+        """
+        blob = self._redis.get(key)
+        if blob is not None:
+            self._touch([key])
+        return blob
+
+    def set_blob(self, key, blob, ttl):
+        """Caches a value alongside the results. It counts towards the
+        memory budget and is evicted like results are.
+
+        Args:
+            key (str): key of the value
+            blob (bytes): the value
+            ttl (int): seconds until the value expires
+        """
+        old = self._redis.hget(ENTRY_SIZE_KEY, key)
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.set(name=key, value=blob, ex=ttl or None)
+        pipe.hset(ENTRY_SIZE_KEY, key, len(blob))
+        pipe.zadd(ACCESS_TIME_KEY, {key: time.time()})
+        pipe.zadd(ACCESS_COUNT_KEY, {key: 1}, nx=True)
+        pipe.incrby(TOTAL_SIZE_KEY, len(blob) - int(old or 0))
+        pipe.execute()
+
+        self._enforce_budget(protected={key})
+
+    def leasem(self, func, repos, owner):
+        """Takes the lease on fetching results for each repo that
+        no other task is fetching results for already.
+
+        Args:
+            func (function): Query function used
+            repos (list[int]): list of repo_ids of repos
+            owner (str): id of the task that will fetch the results
+
+        Returns:
+            list[int]: repo_ids whose lease was taken by 'owner'.
+            dict{str: list[int]}: repo_ids leased by other tasks, by task id.
+        """
+        hs = [self._get_hash(func, r) for r in repos]
+        if not hs:
+            return [], {}
+
+        pipe = self._redis.pipeline(transaction=False)
+        for h in hs:
+            pipe.set(name=LEASE_KEY.format(h), value=owner, nx=True, ex=LEASE_TTL)
+        taken = pipe.execute()
+
+        acquired = [r for r, t in zip(repos, taken) if t]
+
+        held = [(r, h) for r, h, t in zip(repos, hs, taken) if not t]
+        holders = self._redis.mget([LEASE_KEY.format(h) for _, h in held]) if held else []
+
+        others = {}
+        for (r, _), holder in zip(held, holders):
+            if holder is None:
+                # released since we tried to take it, nothing to wait for.
+                continue
+            others.setdefault(holder.decode("utf-8"), []).append(r)
+
+        return acquired, others
+
+    def releasem(self, func, repos, owner):
+        """Releases the leases 'owner' holds on fetching results for repos,
+        and notifies anyone waiting on them.
+
+        Args:
+            func (function): Query function used
+            repos (list[int]): list of repo_ids of repos
+            owner (str): id of the task that fetched the results
+        """
+        hs = [self._get_hash(func, r) for r in repos]
+        if not hs:
+            return
+
+        # only release leases that weren't taken over by another task after expiring.
+        keys = [LEASE_KEY.format(h) for h in hs]
+        holders = self._redis.mget(keys)
+        owned = [k for k, o in zip(keys, holders) if o is not None and o.decode("utf-8") == owner]
+
+        pipe = self._redis.pipeline(transaction=False)
+        if owned:
+            pipe.delete(*owned)
+
+        # waiters re-check whether the results arrived or their fetch was given up.
+        pipe.publish(READY_CHANNEL.format(func.__name__), json.dumps(hs))
+        pipe.execute()
+
+    def wait(self, func, repos, timeout=WAIT_TIMEOUT, leased=False):
+        """Blocks until results for all repos are in the cache, or timeout passes.
+
+        Writers publish the keys they've set on the query's ready channel,
+        so waiting costs no Redis operations until data arrives.
 
         Args:
             func (function): Query function used
             repo (list[int]): list of repo_ids of repos
+            timeout (float | None): seconds to wait at most, forever if None.
+            leased (bool): stop waiting if a missing result isn't being fetched
+                by any task anymore, i.e. if its lease was released or expired.
 
         Returns:
-            pd.DataFrame | None: Data if all available.
+            bool: whether all results are available.
         """
+        hs = [self._get_hash(func, r) for r in repos]
+        if not hs:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            # subscribe before checking, so that nothing published between
+            # the check and the subscription is missed.
+            pubsub.subscribe(READY_CHANNEL.format(func.__name__))
+
+            missing = set(hs)
+            recheck = 0
+            while True:
+                if time.monotonic() >= recheck:
+                    check = list(missing)
+                    stamps = self._redis.mget([STAMP_KEY.format(h) for h in check])
+                    missing = {h for h, st in zip(check, stamps) if st is None}
+                    recheck = time.monotonic() + WAIT_RECHECK
 
-        num_repos = len(repos)
-        ready = self.existsm(func=func, repos=repos) == num_repos
-        if not ready:
+                    if missing and leased:
+                        # a result that's still missing but no longer leased won't arrive.
+                        if self._redis.exists(*[LEASE_KEY.format(h) for h in missing]) < len(missing):
+                            return False
+
+                if not missing:
+                    return True
+
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    return False
+
+                block = recheck - now if deadline is None else min(recheck, deadline) - now
+                msg = pubsub.get_message(timeout=max(block, 0))
+                if msg is not None and msg["type"] == "message":
+                    # keys are announced when written and when their lease is released,
+                    # which may mean their fetch failed. check what actually happened.
+                    if missing & set(json.loads(msg["data"])):
+                        recheck = 0
+        finally:
+            pubsub.close()
+
+    def _read_chunks(self, h, manifest, columns=None):
+        """
+        (private)
+        Reads and reassembles the chunks of a chunked entry. Chunks are
+        fetched a few at a time and decoded as they arrive.
+
+        Args:
+        -----
+            h (str): key of the entry
+            manifest (dict{chunks, rows, stamp}): manifest of the entry
+            columns (list[str] | None): only decode these columns, all columns if None.
+
+        Returns:
+        --------
+            pa.Table | None: the entry, None if a chunk is missing.
+        """
+        keys = [CHUNK_KEY.format(h, manifest["stamp"], i) for i in range(manifest["chunks"])]
+
+        tables = []
+        for i in range(0, len(keys), READ_BATCH):
+            for b in self._redis.mget(keys[i : i + READ_BATCH]):
+                if b is None:
+                    return None
+                tables.append(codec.decode(b, columns=columns))
+
+        return pa.concat_tables(tables)
+
+    def count_search(self, repos, orgs):
+        """Counts a search for repos and orgs towards their popularity.
+
+        Args:
+            repos (list[int]): repo_ids searched for individually
+            orgs (list[str]): names of orgs searched for
+        """
+        members = [f"repo:{r}" for r in repos] + [f"org:{o}" for o in orgs]
+        if not members:
+            return
+
+        pipe = self._redis.pipeline(transaction=False)
+        for m in members:
+            pipe.zincrby(POPULARITY_KEY, 1, m)
+        pipe.execute()
+
+    def popular(self, n):
+        """Most searched for repos and orgs.
+
+        Args:
+            n (int): number of repos and orgs to return
+
+        Returns:
+            list[int]: repo_ids, most popular first.
+            list[str]: names of orgs, most popular first.
+        """
+        repos, orgs = [], []
+        for m in self._redis.zrevrange(POPULARITY_KEY, 0, n - 1):
+            kind, _, value = m.decode("utf-8").partition(":")
+            if kind == "repo":
+                repos.append(int(value))
+            else:
+                orgs.append(value)
+        return repos, orgs
+
+    def decay_popularity(self, factor=POPULARITY_DECAY):
+        """Scales down the search counts so that older searches weigh less,
+        dropping repos and orgs that haven't been searched for in a long time.
+
+        Args:
+            factor (float): factor each count is multiplied by
+        """
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zunionstore(POPULARITY_KEY, {POPULARITY_KEY: factor})
+        pipe.zremrangebyscore(POPULARITY_KEY, "-inf", 0.01)
+        pipe.execute()
+
+    def prune(self):
+        """Removes entries and values that expired from the eviction
+        bookkeeping, so that their sizes stop counting towards the
+        memory budget and their keys stop taking up memory.
+
+        Returns:
+            int: number of entries removed
+        """
+        pruned = 0
+        for members in (
+            self._redis.hscan_iter(ENTRY_SIZE_KEY, count=GC_BATCH),
+            self._redis.zscan_iter(ACCESS_COUNT_KEY, count=GC_BATCH),
+        ):
+            batch = []
+            for m, _ in members:
+                batch.append(m.decode("utf-8") if isinstance(m, bytes) else m)
+                if len(batch) >= GC_BATCH:
+                    pruned += self._prune(batch)
+                    batch = []
+            pruned += self._prune(batch)
+
+        if pruned:
+            logging.warning(f"CACHE: PRUNED {pruned} EXPIRED ENTRIES")
+        return pruned
+
+    def _prune(self, hs):
+        """
+        (private)
+        Removes keys of 'hs' that no longer exist from the eviction bookkeeping.
+
+        Args:
+        -----
+            hs (list[str]): keys in the bookkeeping
+
+        Returns:
+        --------
+            int: number of keys removed
+        """
+        expired = self._expired(hs)
+        if expired:
+            self._forget(expired)
+        return len(expired)
+
+    def _expired(self, hs):
+        """
+        (private)
+        Keys of 'hs' that expired or were deleted.
+
+        Args:
+        -----
+            hs (list[str]): keys to check
+
+        Returns:
+        --------
+            list[str]: keys that don't exist
+        """
+        if not hs:
+            return []
+
+        pipe = self._redis.pipeline(transaction=False)
+        for h in hs:
+            pipe.exists(h)
+        return [h for h, e in zip(hs, pipe.execute()) if not e]
+
+    def decay_access_counts(self, factor=ACCESS_COUNT_DECAY):
+        """Scales down the access counts that LFU eviction orders entries by,
+        so that entries used often long ago are evicted before ones used often now.
+
+        Args:
+            factor (float): factor each count is multiplied by
+        """
+        self._redis.zunionstore(ACCESS_COUNT_KEY, {ACCESS_COUNT_KEY: factor})
+
+    def _chunk_keys(self, h, chunks):
+        """
+        (private)
+        Keys of the chunks of an entry.
+
+        Args:
+        -----
+            h (str): key of the entry
+            chunks (bytes | str): "<stamp>:<number of chunks>", as recorded in ENTRY_CHUNKS_KEY
+
+        Returns:
+        --------
+            list[str]: keys of the chunks
+        """
+        if isinstance(chunks, bytes):
+            chunks = chunks.decode("utf-8")
+        stamp, n = chunks.split(":")
+        return [CHUNK_KEY.format(h, stamp, i) for i in range(int(n))]
+
+    def touchm(self, func, repos):
+        """Marks entries for hash(func, repo) as recently used
+        without reading them, so they are the last to be evicted.
+
+        Args:
+            func (function): Query function used
+            repo (list[int]): list of repo_ids of repos
+        """
+        self._touch([self._get_hash(func, r) for r in repos])
+
+    def _touch(self, hs):
+        """
+        (private)
+        Records an access of keys 'hs' for LRU and LFU eviction.
+
+        Args:
+        -----
+            hs (list[str]): keys that were accessed
+        """
+        if not hs:
+            return
+
+        now = time.time()
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zadd(ACCESS_TIME_KEY, {h: now for h in hs}, xx=True)
+        for h in hs:
+            pipe.zincrby(ACCESS_COUNT_KEY, 1, h)
+        pipe.execute()
+
+    def _forget(self, hs):
+        """
+        (private)
+        Deletes keys 'hs' and removes them from the eviction bookkeeping.
+
+        Args:
+        -----
+            hs (list[str]): keys to remove
+
+        Returns:
+        --------
+            int: number of bytes freed
+        """
+        sizes = self._redis.hmget(ENTRY_SIZE_KEY, hs)
+        freed = sum(int(s) for s in sizes if s is not None)
+
+        chunks = self._redis.hmget(ENTRY_CHUNKS_KEY, hs)
+        chunk_keys = [k for h, c in zip(hs, chunks) if c is not None for k in self._chunk_keys(h, c)]
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.delete(*hs, *chunk_keys)
+        pipe.delete(*[STAMP_KEY.format(h) for h in hs])
+        pipe.hdel(ENTRY_SIZE_KEY, *hs)
+        pipe.hdel(ENTRY_CHUNKS_KEY, *hs)
+        pipe.hdel(WATERMARK_KEY, *hs)
+        pipe.zrem(ACCESS_TIME_KEY, *hs)
+        pipe.zrem(ACCESS_COUNT_KEY, *hs)
+        pipe.decrby(TOTAL_SIZE_KEY, freed)
+        pipe.execute()
+
+        return freed
+
+    def _enforce_budget(self, protected=None):
+        """
+        (private)
+        Evicts whole entries, coldest first by the configured
+        policy, until the cache is within its memory budget.
+
+        Entries that expired still count towards the memory used until they're
+        pruned, so the bookkeeping is pruned before anything is evicted, and
+        expired candidates are removed rather than counted as evicted.
+
+        Args:
+        -----
+            protected (set[str]): keys that may not be evicted.
+        """
+        global _last_prune
+
+        if MEMORY_BUDGET_MB <= 0:
+            return
+
+        protected = protected or set()
+
+        budget = MEMORY_BUDGET_MB * 1024 * 1024
+        order_key = ACCESS_COUNT_KEY if EVICTION_POLICY == "lfu" else ACCESS_TIME_KEY
+
+        used = int(self._redis.get(TOTAL_SIZE_KEY) or 0)
+        if used > budget and time.time() - _last_prune > PRUNE_INTERVAL:
+            _last_prune = time.time()
+            self.prune()
+            used = int(self._redis.get(TOTAL_SIZE_KEY) or 0)
+
+        start = 0
+        while used > budget:
+            candidates = self._redis.zrange(order_key, start, start + EVICTION_BATCH - 1)
+            if not candidates:
+                logging.warning(f"CACHE: {used} bytes used, over budget but nothing left to evict")
+                break
+
+            candidates = [c.decode("utf-8") if isinstance(c, bytes) else c for c in candidates]
+
+            # expired since the last prune, they only take up bookkeeping.
+            expired = [c for c in self._expired(candidates) if c not in protected]
+            if expired:
+                used -= self._forget(expired)
+                continue
+
+            sizes = self._redis.hmget(ENTRY_SIZE_KEY, candidates)
+
+            # take only as many of the coldest candidates as are needed to fit.
+            victims = []
+            to_free = used - budget
+            for c, size in zip(candidates, sizes):
+                if to_free <= 0:
+                    break
+                if c in protected:
+                    # protected keys stay at the front of the order, skip over them.
+                    start += 1
+                    continue
+                victims.append(c)
+                to_free -= int(size or 0)
+
+            if victims:
+                self._demote(victims)
+                used -= self._forget(victims)
+                logging.warning(f"CACHE: EVICTED {len(victims)} ENTRIES, {used} BYTES USED")
+
+    def _demote(self, hs):
+        """
+        (private)
+        Writes the results at keys 'hs' to the disk tier before they're evicted.
+        Values that aren't query results, e.g. rendered figures, are dropped.
+
+        Args:
+        -----
+            hs (list[str]): keys about to be evicted
+        """
+        if not spill_store.enabled:
+            return
+
+        stamps = self._redis.mget([STAMP_KEY.format(h) for h in hs])
+        marks = self._redis.hmget(WATERMARK_KEY, hs)
+
+        demoted = 0
+        for h, st, w in zip(hs, stamps, marks):
+            # only results have stamps.
+            if st is None:
+                continue
+
+            tables = self._tables([h], [st])
+            if tables is None:
+                continue
+
+            try:
+                spill_store.put(h, tables[h], None if w is None else w.decode("utf-8"))
+            except OSError as e:
+                logging.error(f"CACHE: COULDN'T DEMOTE {h} TO DISK: {e}")
+                return
+            demoted += 1
+
+        if demoted:
+            spill_store.prune()
+            logging.warning(f"CACHE: DEMOTED {demoted} ENTRIES TO DISK")
+
+    def _promote(self, func, repos):
+        """
+        (private)
+        Moves the results of repos that were demoted to disk back into Redis.
+
+        Args:
+        -----
+            func (function): Query function used
+            repos (list[int]): repo_ids whose results aren't in Redis
+
+        Returns:
+        --------
+            list[int]: repo_ids whose results were promoted.
+        """
+        if not spill_store.enabled or not repos:
+            return []
+
+        promoted, tables, marks = [], [], []
+        for r in repos:
+            spilled = spill_store.take(self._get_hash(func, r))
+            if spilled is None:
+                continue
+            promoted.append(r)
+            tables.append(spilled[0])
+            marks.append(spilled[1])
+
+        if promoted:
+            self.setm(func=func, repos=promoted, datas=tables, watermarks=marks)
+            logging.warning(f"CACHE: PROMOTED {len(promoted)} {func.__name__} ENTRIES FROM DISK")
+
+        return promoted
+
+    def grabm(self, func, repos, columns=None, as_arrow=False):
+        """Checks to see if data is ready using the version stamps
+        of the entries and builds aggregate DataFrame to return to callback.
+
+        Entries that this process has already decoded at their current
+        version are served from its local cache instead of from Redis.
+        The entries are concatenated as Arrow Tables, which doesn't copy
+        their buffers, and converted to pandas once.
+
+        Args:
+            func (function): Query function used
+            repo (list[int]): list of repo_ids of repos
+            columns (list[str] | None): only decode these columns, all columns if None.
+            as_arrow (bool): return the Arrow Table instead of converting it to pandas.
+
+        Returns:
+            pd.DataFrame | pa.Table | None: Data if all available.
+        """
+
+        # create hashes for each (func, repo_id) pair
+        hs = [self._get_hash(func, r) for r in repos]
+
+        # every entry has a stamp while it exists, so this is
+        # also the check of whether all of the data is ready.
+        stamps = self._redis.mget([STAMP_KEY.format(h) for h in hs]) if hs else []
+        if any(st is None for st in stamps):
+            # results that were evicted to disk are moved back, the rest aren't ready.
+            absent = [r for r, st in zip(repos, stamps) if st is None]
+            if len(self._promote(func, absent)) < len(absent):
+                return None
+
+            stamps = self._redis.mget([STAMP_KEY.format(h) for h in hs])
+            if any(st is None for st in stamps):
+                return None
+
+        tables = self._tables(hs, stamps, columns)
+        if tables is None:
             return None
 
-        # get all results from cache
-        dfs_from_cache = self.getm(func=func, repos=repos)
+        reads = _reads.get()
+        if reads is not None:
+            reads.update((h, st.decode("utf-8")) for h, st in zip(hs, stamps))
+
+        self._touch(hs)
 
-        pd_dfs = []
-        for bdf in dfs_from_cache:
-            bbuff = io.BytesIO(bdf)
-            bbuff.seek(0)
-            df = pd.read_feather(bbuff)
-            pd_dfs.append(df)
+        table = self._concat([tables[h] for h in hs])
+        if table is None:
+            # schemas of the entries couldn't be reconciled in Arrow, let pandas do it.
+            return pd.concat([self._decode_dictionaries(tables[h]).to_pandas() for h in hs], ignore_index=True)
 
-        out_df = pd.concat(pd_dfs)
+        if as_arrow:
+            return table
 
-        return out_df
+        # split_blocks skips consolidating same-typed columns into one block,
+        # which would copy all of them once more.
+        return self._decode_dictionaries(table).to_pandas(split_blocks=True)
+
+    def watermarks(self, func):
+        """High-water marks of the cached results of the current version of a query.
+
+        Args:
+            func (function): Query function used
+
+        Returns:
+            dict{int: str}: repo_id -> high-water mark, for repos whose results have one.
+        """
+        prefix = self._get_hash(func, "")
+
+        marks = {}
+        for h, w in self._redis.hscan_iter(WATERMARK_KEY, match=f"{prefix}*", count=1000):
+            marks[int(h.decode("utf-8")[len(prefix) :])] = w.decode("utf-8")
+        return marks
+
+    def mergem(self, func, repos, datas, key, watermarks, sort_by=None, ttl=None):
+        """Merges the rows that changed since the entries were cached into them.
+
+        Cached rows that were changed are replaced by their new version,
+        the rest of the changed rows are appended. Entries that have
+        expired or been evicted in the meantime are skipped, their
+        results are queried in full when they're next needed.
+
+        Args:
+            func (function): Query function used
+            repos (list[int]): list of repo_ids of repos
+            datas (list[pd.DataFrame | pa.Table]): rows changed since each entry's watermark
+            key (str): column that identifies a row
+            watermarks (list[str | None]): new high-water mark of each entry, None keeps the old one.
+            sort_by (str | None): column the merged rows are sorted by, if any.
+            ttl (int | None): seconds until the values expire. Defaults to the query's TTL.
+
+        Returns:
+            boolean: confirmation of successful set operations.
+        """
+        hs = [self._get_hash(func, r) for r in repos]
+        if not hs:
+            return True
+
+        stamps = self._redis.mget([STAMP_KEY.format(h) for h in hs])
+
+        merged_repos, merged, marks = [], [], []
+        gone = []
+        advanced = {}
+        for r, h, st, new, w in zip(repos, hs, stamps, datas, watermarks):
+            if st is None:
+                gone.append(h)
+                continue
+
+            if isinstance(new, pa.Table):
+                new = new.to_pandas()
+
+            if new.empty:
+                # nothing changed, only the watermark moves.
+                if w is not None:
+                    advanced[h] = w
+                continue
+
+            tables = self._tables([h], [st])
+            if tables is None:
+                gone.append(h)
+                continue
+
+            old = tables[h].to_pandas()
+            df = pd.concat([old[~old[key].isin(new[key])], new], ignore_index=True)
+            if sort_by is not None:
+                df = df.sort_values(by=sort_by, ignore_index=True)
+
+            # categoricals with different categories are concatenated as objects.
+            for c in new.select_dtypes("category").columns:
+                df[c] = df[c].astype("category")
+
+            merged_repos.append(r)
+            merged.append(df)
+            marks.append(w)
+
+        pipe = self._redis.pipeline(transaction=False)
+        if advanced:
+            pipe.hset(WATERMARK_KEY, mapping=advanced)
+        # results of these will be fetched in full, along with a new watermark.
+        if gone:
+            pipe.hdel(WATERMARK_KEY, *gone)
+        pipe.execute()
+
+        return self.setm(func=func, repos=merged_repos, datas=merged, ttl=ttl, watermarks=marks)
+
+    def _tables(self, hs, stamps, columns=None):
+        """
+        (private)
+        Reads entries as Arrow Tables, from this process' local cache
+        where it has them at their current stamp and from Redis otherwise.
+
+        Args:
+        -----
+            hs (list[str]): keys of the entries
+            stamps (list[bytes]): current version stamp of each entry
+            columns (list[str] | None): only decode these columns, all columns if None.
+
+        Returns:
+        --------
+            dict{str: pa.Table} | None: table of each key, None if an entry is missing.
+        """
+        tables = {}
+        for h, st in zip(hs, stamps):
+            t = local_cache.get(h, st, columns)
+            if t is not None:
+                tables[h] = t
+
+        # get the rest of the results from cache, a batch at a time so that
+        # only one batch of serialized results is held in memory.
+        misses = [(h, st) for h, st in zip(hs, stamps) if h not in tables]
+        for i in range(0, len(misses), READ_BATCH):
+            batch = misses[i : i + READ_BATCH]
+            blobs = self._redis.mget([h for h, _ in batch])
+
+            for (h, st), b in zip(batch, blobs):
+                # an entry may have expired or been evicted since its stamp was read
+                if b is None:
+                    return None
+
+                # decode the columns that were cached before as well,
+                # so the local copy only ever grows towards the full table.
+                want = columns
+                prev = local_cache.peek(h, st)
+                if columns is not None and prev is not None:
+                    want = prev.column_names + [c for c in columns if c not in prev.column_names]
+
+                if codec.is_manifest(b):
+                    t = self._read_chunks(h, codec.decode_manifest(b), want)
+                    if t is None:
+                        return None
+                else:
+                    t = codec.decode(b, columns=want)
+
+                local_cache.put(h, st, t, complete=columns is None)
+                tables[h] = t if columns is None else t.select(columns)
+
+        return tables
+
+    def _wide_dictionaries(self, table):
+        """
+        (private)
+        Gives the dictionary-encoded columns of an entry 32-bit indices.
+
+        Categoricals are converted with the narrowest indices that fit their
+        categories, entries written at different times must agree on them to be
+        concatenated without copying.
+        """
+        if not any(pa.types.is_dictionary(f.type) for f in table.schema):
+            return table
+
+        fields = [
+            f.with_type(pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type) else f
+            for f in table.schema
+        ]
+        return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+    def _decode_dictionaries(self, table):
+        """
+        (private)
+        Replaces the dictionary-encoded columns of a table by their values,
+        so they're read into pandas as plain columns rather than Categoricals,
+        which group and pivot differently.
+        """
+        if not any(pa.types.is_dictionary(f.type) for f in table.schema):
+            return table
+
+        fields = [f.with_type(f.type.value_type) if pa.types.is_dictionary(f.type) else f for f in table.schema]
+        return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+    def _concat(self, tables):
+        """
+        (private)
+        Concatenates the entries of several repos without copying their buffers.
+
+        Entries of repos without any results have null-typed columns, and a
+        column may be integer in one entry and floating in another, so the
+        schemas are unified if they aren't identical.
+
+        Args:
+        -----
+            tables (list[pa.Table]): entries to concatenate
+
+        Returns:
+        --------
+            pa.Table | None: the entries as one table, None if their schemas are incompatible.
+        """
+        try:
+            return pa.concat_tables(tables)
+        except pa.ArrowInvalid:
+            pass
+
+        try:
+            try:
+                return pa.concat_tables(tables, promote_options="permissive")
+            except TypeError:
+                # pyarrow < 14
+                return pa.concat_tables(tables, promote=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return None
@@ -0,0 +1,154 @@
+"""
+    Storage format of the results cache.
+
+    Results are stored as Arrow IPC files (Feather V2), optionally with their
+    buffers compressed, behind a single header byte naming the codec that wrote them:
+
+        <header byte><arrow ipc file>
+
+    Entries written before the header was introduced are plain Feather V2 files,
+    which start with the Arrow magic bytes "ARROW1" instead. Header bytes are all
+    below the printable range, so they never collide with that magic and old entries
+    are still read.
+
+    Results too large for one value are split into chunks of rows, each stored
+    as its own entry in the format above, and a manifest is stored in their place:
+
+        <manifest header byte><json {"chunks": n, "rows": n, "stamp": s}>
+
+    Chunks are keyed by the stamp of the write that made them, so a reader holding
+    a manifest only ever reads chunks of that manifest's write. Chunks of a value
+    that was overwritten are kept for a short grace period, so that readers that
+    fetched its manifest just before can still finish reading them.
+"""
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# header byte -> (codec name, arrow compression)
+CODECS = {
+    b"\x01": ("uncompressed", "uncompressed"),
+    b"\x02": ("lz4", "lz4"),
+    b"\x03": ("zstd", "zstd"),
+}
+
+# codec name -> header byte
+HEADERS = {name: header for header, (name, _) in CODECS.items()}
+
+# codec used for new entries. zstd is smallest, lz4 decodes faster.
+DEFAULT_CODEC = os.getenv("CACHE_CODEC", "zstd")
+
+# start of a Feather V2 file written without a header.
+ARROW_MAGIC = b"ARROW1"
+
+# header of a manifest of a chunked entry.
+MANIFEST_HEADER = b"\x10"
+
+
+def encode(data, codec=None):
+    """Serializes a frame into the cache's storage format.
+
+    Args:
+        data (pd.DataFrame | pa.Table): results for one repo
+        codec (str | None): name of codec to use. Defaults to CACHE_CODEC.
+
+    Returns:
+        bytes: header byte followed by the Arrow IPC file.
+    """
+    codec = codec or DEFAULT_CODEC
+    if codec not in HEADERS:
+        raise ValueError(f"Unknown cache codec: {codec}")
+
+    header = HEADERS[codec]
+    compression = CODECS[header][1]
+
+    if isinstance(data, pd.DataFrame):
+        data = pa.Table.from_pandas(data, preserve_index=False)
+
+    # offsets in the IPC file are relative to its start,
+    # so the header is prepended after it's written.
+    sink = pa.BufferOutputStream()
+    feather.write_feather(data, sink, compression=compression)
+
+    return header + sink.getvalue().to_pybytes()
+
+
+def decode(blob, columns=None):
+    """Deserializes a cache entry into an Arrow Table.
+
+    Only the buffers of the requested columns are read and decompressed.
+
+    Args:
+        blob (bytes): value read from the cache
+        columns ([str] | None): columns to decode, all columns if None.
+
+    Returns:
+        pa.Table: results for one repo
+    """
+    buf = pa.py_buffer(blob)
+
+    # strip the header without copying the payload
+    header = blob[:1]
+    if header in CODECS:
+        buf = buf.slice(1)
+    elif blob[: len(ARROW_MAGIC)] != ARROW_MAGIC:
+        raise ValueError("Unknown cache entry format")
+
+    return feather.read_table(pa.BufferReader(buf), columns=columns, memory_map=False)
+
+
+def encode_manifest(chunks, rows, stamp):
+    """Serializes the manifest of a chunked entry.
+
+    Args:
+        chunks (int): number of chunks the entry was split into
+        rows (int): total number of rows of the entry
+        stamp (str): stamp of the write, part of the keys of its chunks
+
+    Returns:
+        bytes: manifest header byte followed by the manifest.
+    """
+    return MANIFEST_HEADER + json.dumps({"chunks": chunks, "rows": rows, "stamp": stamp}).encode("utf-8")
+
+
+def decode_manifest(blob):
+    """Deserializes the manifest of a chunked entry.
+
+    Args:
+        blob (bytes): value read from the cache
+
+    Returns:
+        dict{chunks, rows, stamp}: manifest
+    """
+    return json.loads(blob[1:])
+
+
+def is_manifest(blob):
+    """Whether a cache entry is the manifest of a chunked entry.
+
+    Args:
+        blob (bytes): value read from the cache
+
+    Returns:
+        bool: True if the entry is a manifest
+    """
+    return blob[:1] == MANIFEST_HEADER
+
+
+def codec_of(blob):
+    """Name of the codec that a cache entry was written with.
+
+    Args:
+        blob (bytes): value read from the cache
+
+    Returns:
+        str: codec name, "legacy" for entries written without a header.
+    """
+    header = blob[:1]
+    if header in CODECS:
+        return CODECS[header][0]
+    if header == MANIFEST_HEADER:
+        return "manifest"
+    return "legacy"
@@ -0,0 +1,94 @@
+"""
+    Process-wide connection pools for the Redis services.
+
+    The results cache (redis-cache) and the user sessions store (redis-users)
+    each get one pool per process, shared by every client handed out here, so
+    callbacks reuse open connections instead of connecting on every call.
+
+    Idle connections are checked with a PING before they're reused once they've
+    been idle for REDIS_HEALTH_CHECK_INTERVAL seconds, and commands that fail on
+    a dropped connection are retried on a fresh one, so callers don't need to
+    PING the services themselves.
+
+    redis-py resets a pool in a process forked from the one that created it,
+    so pools created before Celery forks its workers are safe to use in them.
+"""
+import os
+import threading
+import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+
+# seconds a connection may sit idle before it's checked on reuse.
+HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# times a command is retried after its connection dropped.
+RETRIES = 3
+
+# (service, decode_responses) -> pool
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(service, decode_responses):
+    """
+    (private)
+    Returns the pool of connections to service, creating it on first use.
+
+    Args:
+        service (str): "cache" or "users"
+        decode_responses (bool): whether replies are decoded to str
+
+    Returns:
+        redis.ConnectionPool: pool shared by the process
+    """
+    key = (service, decode_responses)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        if key not in _pools:
+            if service == "cache":
+                # openshift, compose will reconcile the 'redis' naming via the dns
+                host = os.getenv("REDIS_SERVICE_HOST", "redis-cache")
+                port = os.getenv("REDIS_SERVICE_PORT", "6379")
+            else:
+                host = os.getenv("REDIS_SERVICE_USERS_HOST", "redis-users")
+                port = 6379
+
+            _pools[key] = redis.ConnectionPool(
+                host=host,
+                port=port,
+                password=os.getenv("REDIS_PASSWORD", ""),
+                decode_responses=decode_responses,
+                health_check_interval=HEALTH_CHECK_INTERVAL,
+                socket_keepalive=True,
+                retry=Retry(ExponentialBackoff(), RETRIES),
+                retry_on_error=[redis.exceptions.ConnectionError, redis.exceptions.TimeoutError],
+            )
+        return _pools[key]
+
+
+def cache_client(decode_responses=False):
+    """Client of the results cache, redis-cache.
+
+    Args:
+        decode_responses (bool): whether replies are decoded to str
+
+    Returns:
+        redis.StrictRedis: client on the process' shared pool
+    """
+    return redis.StrictRedis(connection_pool=_pool("cache", decode_responses))
+
+
+def users_client(decode_responses=False):
+    """Client of the user sessions store, redis-users.
+
+    Args:
+        decode_responses (bool): whether replies are decoded to str
+
+    Returns:
+        redis.StrictRedis: client on the process' shared pool
+    """
+    return redis.StrictRedis(connection_pool=_pool("users", decode_responses))
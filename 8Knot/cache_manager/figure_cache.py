@@ -0,0 +1,97 @@
+"""
+    Cache of rendered visualizations.
+
+    Visualization callbacks are pure functions of the selected repos, the values
+    of their own controls and the cached query results they read. Their outputs
+    are cached under a key made of all of those, where the query results are
+    identified by their version stamps, so a figure is rendered again as soon as
+    any result it was built from is rewritten, and never otherwise. The stamps of
+    a rendered figure are the ones its results were read at, not the ones current
+    when it's stored, so a figure is never stored under stamps newer than its data.
+
+    The key also includes a fingerprint of the module that defines the callback,
+    so changing a visualization doesn't serve figures rendered by its old code.
+
+    Figures are stored as compressed Plotly JSON in redis-cache, next to the
+    results they're built from, and are evicted with them to keep the cache
+    within its memory budget.
+"""
+import os
+import json
+import zlib
+import hashlib
+import inspect
+import logging
+import functools
+from plotly.io.json import to_json_plotly
+from cache_manager.cache_manager import CacheManager as cm
+
+# key of a rendered figure: (component id, digest of the callback's inputs)
+FIGURE_KEY = "8knot:cache:figure:{}:{}"
+
+# seconds a rendered figure is kept. 0 disables expiry.
+FIGURE_TTL = int(os.getenv("CACHE_FIGURE_TTL", str(60 * 60 * 24)))
+
+# set to False to render every figure on request.
+FIGURE_CACHE_ENABLED = os.getenv("CACHE_FIGURES", "True") == "True"
+
+
+def memoize_figure(viz_id, queries):
+    """Caches the outputs of a visualization callback.
+
+    The callback's first argument must be the list of selected repos,
+    the rest are the values of its controls.
+
+    Args:
+        viz_id (str): id of the component the callback renders
+        queries (list[function]): queries whose results the callback reads
+
+    Returns:
+        function: decorator
+    """
+
+    def decorator(fn):
+        module = inspect.getsource(inspect.getmodule(fn))
+        version = hashlib.md5(module.encode("utf-8")).hexdigest()[:12]
+
+        def key(repolist, args, stamps):
+            inputs = json.dumps([version, sorted(repolist), args, stamps], default=str)
+            return FIGURE_KEY.format(viz_id, hashlib.md5(inputs.encode("utf-8")).hexdigest())
+
+        @functools.wraps(fn)
+        def wrapper(repolist, *args):
+            if not FIGURE_CACHE_ENABLED or not repolist:
+                return fn(repolist, *args)
+
+            cache = cm()
+
+            stamps = cache.stampsm(queries, sorted(repolist))
+            if stamps is not None:
+                blob = cache.get_blob(key(repolist, args, stamps))
+                if blob is not None:
+                    logging.warning(f"{viz_id} - FROM CACHE")
+                    return json.loads(zlib.decompress(blob))
+
+            # the figure is stored under the stamps of the results it was rendered
+            # from, which may have been rewritten since they were checked above.
+            with cache.recording() as reads:
+                out = fn(repolist, *args)
+
+            stamps = cache.recorded_stampsm(reads, queries, sorted(repolist))
+            if stamps is None:
+                # the callback didn't read all of the results, e.g. it rendered a placeholder.
+                return out
+            k = key(repolist, args, stamps)
+
+            try:
+                blob = zlib.compress(to_json_plotly(out).encode("utf-8"), 1)
+            except (TypeError, ValueError):
+                # e.g. dash.no_update, nothing to cache.
+                return out
+
+            cache.set_blob(k, blob, FIGURE_TTL)
+            return out
+
+        return wrapper
+
+    return decorator
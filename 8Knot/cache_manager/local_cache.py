@@ -0,0 +1,127 @@
+"""
+    In-process cache of decoded results.
+
+    Sits in front of Redis in each worker process. Entries are decoded Arrow Tables,
+    keyed by the Redis key of the result they were decoded from and tagged with the
+    version stamp that result had in Redis. A hit is only served if the stamp still
+    matches, so rewritten or evicted results are never served from here.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+# memory (in megabytes) that decoded tables may take up per process. 0 disables the cache.
+# Every worker process has its own, so this is multiplied by the concurrency of the workers
+# and has to fit in their memory limit next to the results being built.
+LOCAL_CACHE_MB = int(os.getenv("CACHE_LOCAL_MB", "64"))
+
+
+class LocalCache:
+    """
+    Size-bounded LRU of decoded Arrow Tables.
+
+    Attributes
+    ----------
+        max_bytes : int
+            Total size of tables held before least-recently used ones are dropped.
+
+    Methods
+    -------
+        get(key, stamp, columns):
+            Returns table for key if cached at stamp with the requested columns.
+
+        peek(key, stamp):
+            Returns table for key if cached at stamp, without marking it as used.
+
+        put(key, stamp, table, complete):
+            Caches table for key at stamp, dropping the least-recently used tables to fit.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, stamp, columns=None):
+        """Returns the cached table for key.
+
+        Args:
+            key (str): Redis key the table was decoded from
+            stamp (str): current version stamp of the key in Redis
+            columns ([str] | None): columns needed, all columns if None.
+
+        Returns:
+            pa.Table | None: table with the requested columns, None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            e_stamp, table, complete = entry
+            if e_stamp != stamp:
+                # stale, the result was rewritten in Redis.
+                self._drop(key)
+                return None
+
+            if columns is None:
+                if not complete:
+                    return None
+            elif not set(columns).issubset(table.column_names):
+                return None
+
+            self._entries.move_to_end(key)
+
+        return table if columns is None else table.select(columns)
+
+    def peek(self, key, stamp):
+        """Returns the cached table for key, which may be missing columns.
+
+        Args:
+            key (str): Redis key the table was decoded from
+            stamp (str): current version stamp of the key in Redis
+
+        Returns:
+            pa.Table | None: cached table, None if nothing's cached at this stamp.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                return None
+            return entry[1]
+
+    def put(self, key, stamp, table, complete):
+        """Caches a decoded table.
+
+        Args:
+            key (str): Redis key the table was decoded from
+            stamp (str): version stamp of the key in Redis
+            table (pa.Table): decoded result
+            complete (bool): whether table has all of the result's columns.
+        """
+        size = table.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (stamp, table, complete)
+            self._nbytes += size
+
+            while self._nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        """
+        (private)
+        Removes key from the cache. Caller holds the lock.
+        """
+        _, table, _ = self._entries.pop(key)
+        self._nbytes -= table.nbytes
+
+
+# one cache per worker process.
+local_cache = LocalCache(LOCAL_CACHE_MB * 1024 * 1024)
@@ -0,0 +1,192 @@
+"""
+    On-disk tier of the results cache.
+
+    Results evicted from Redis to keep it within its memory budget are demoted
+    here instead of being dropped, and are promoted back into Redis the next time
+    they're needed, so that evicted repos aren't queried from Augur again.
+
+    Each entry is one Arrow IPC file (Feather V2) named after the Redis key of
+    the result, with the result's high-water mark in its schema metadata. Files
+    are memory-mapped on read, so only the pages of the columns that are read
+    are loaded. An entry is in either Redis or on disk, promoting it removes
+    its file.
+
+    The directory should be on a volume that is shared by every process that
+    reads or writes the cache. Entries written by a process whose disk isn't
+    visible to the reader are simply queried again.
+"""
+import os
+import time
+import logging
+import tempfile
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# directory that demoted results are kept in. empty (default) disables the tier.
+SPILL_DIR = os.getenv("CACHE_SPILL_DIR", "")
+
+# disk space (in megabytes) that demoted results may take up. 0 disables the budget.
+SPILL_BUDGET_MB = int(os.getenv("CACHE_SPILL_MB", "0"))
+
+# seconds a demoted result is kept. 0 disables expiry.
+SPILL_TTL = int(os.getenv("CACHE_SPILL_TTL", str(60 * 60 * 24 * 90)))
+
+# compression of demoted results: 'lz4' (default), 'zstd' or 'uncompressed'.
+# uncompressed files are read without copying, compressed ones are smaller.
+SPILL_CODEC = os.getenv("CACHE_SPILL_CODEC", "lz4")
+
+# schema metadata key of a demoted result's high-water mark.
+WATERMARK_META = b"8knot.watermark"
+
+SUFFIX = ".arrow"
+
+
+class SpillStore:
+    """
+    Directory of demoted results.
+
+    Attributes
+    ----------
+        path : str
+            Directory the results are kept in, the tier is disabled if empty.
+
+    Methods
+    -------
+        put(key, table, watermark):
+            Writes a demoted result, replacing any previous one.
+
+        take(key):
+            Reads a demoted result and removes it from disk.
+
+        discard([key]):
+            Removes demoted results that were superseded in Redis.
+
+        prune():
+            Removes expired results, then the oldest ones until the tier is within its budget.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _file(self, key):
+        """
+        (private)
+        Path of the file of key.
+        """
+        return os.path.join(self.path, key + SUFFIX)
+
+    def put(self, key, table, watermark=None):
+        """Writes a demoted result.
+
+        Args:
+            key (str): Redis key of the result
+            table (pa.Table): the result
+            watermark (str | None): high-water mark of the result
+        """
+        if watermark is not None:
+            meta = dict(table.schema.metadata or {})
+            meta[WATERMARK_META] = watermark.encode("utf-8")
+            table = table.replace_schema_metadata(meta)
+
+        # written to a temporary file first, so readers never see a partial file.
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                feather.write_feather(table, f, compression=SPILL_CODEC)
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def take(self, key):
+        """Reads a demoted result and removes its file.
+
+        Args:
+            key (str): Redis key of the result
+
+        Returns:
+            (pa.Table, str | None) | None: the result and its high-water mark, None if it isn't on disk.
+        """
+        path = self._file(key)
+        try:
+            if SPILL_TTL > 0 and time.time() - os.path.getmtime(path) > SPILL_TTL:
+                os.remove(path)
+                return None
+
+            # the mapping stays valid once the file is removed.
+            table = feather.read_table(path, memory_map=True)
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowInvalid):
+            logging.warning(f"CACHE: UNREADABLE SPILLED ENTRY {key}, DROPPING IT")
+            self._remove(path)
+            return None
+
+        self._remove(path)
+
+        meta = dict(table.schema.metadata or {})
+        watermark = meta.pop(WATERMARK_META, None)
+        table = table.replace_schema_metadata(meta or None)
+
+        return table, None if watermark is None else watermark.decode("utf-8")
+
+    def discard(self, keys):
+        """Removes the demoted results of keys, if there are any.
+
+        Args:
+            keys (list[str]): Redis keys of the results
+        """
+        for k in keys:
+            self._remove(self._file(k))
+
+    def prune(self):
+        """Removes expired results, then the least recently demoted
+        results until the tier is within its budget.
+        """
+        now = time.time()
+
+        files = []
+        with os.scandir(self.path) as it:
+            for e in it:
+                if not e.name.endswith(SUFFIX):
+                    continue
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+
+                if SPILL_TTL > 0 and now - st.st_mtime > SPILL_TTL:
+                    self._remove(e.path)
+                else:
+                    files.append((st.st_mtime, st.st_size, e.path))
+
+        if SPILL_BUDGET_MB <= 0:
+            return
+
+        budget = SPILL_BUDGET_MB * 1024 * 1024
+        used = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if used <= budget:
+                break
+            self._remove(path)
+            used -= size
+
+    def _remove(self, path):
+        """
+        (private)
+        Removes a file that another process may have removed already.
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# shared by every process that mounts the directory.
+spill_store = SpillStore(SPILL_DIR)
@@ -3,13 +3,61 @@
 """
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import sqlalchemy as salc
 import os
+import re
+import hashlib
+import io
 import logging
+import numbers
 import sys
+import tempfile
+import threading
 import requests
 from sqlalchemy.exc import SQLAlchemyError
 
+# rows fetched from the server-side cursor at a time by 'stream_query'.
+STREAM_CHUNK_ROWS = int(os.getenv("AUGUR_STREAM_CHUNK_ROWS", "50000"))
+
+# estimated rows of a repo that Augur hasn't collected counts for, e.g. when repo_info
+# couldn't be read. Large selections are split as if all their repos were this size.
+DEFAULT_REPO_ROWS = int(os.getenv("AUGUR_DEFAULT_REPO_ROWS", "10000"))
+
+# run parameterized queries as prepared statements, reused for the life of each connection.
+# must be disabled if the database is behind a pooler in transaction mode, e.g. PgBouncer.
+PREPARE_STATEMENTS = os.getenv("AUGUR_PREPARE_STATEMENTS", "True") == "True"
+
+# a ':name' bind parameter, but not a '::type' cast.
+BIND_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+
+# temporary table the values of a ':name' list of ints are copied into, e.g. repo ids.
+BIND_TABLE = "bind_{}"
+
+# connections each process keeps open to the database, and how many more it may open under load.
+POOL_SIZE = int(os.getenv("AUGUR_POOL_SIZE", "2"))
+POOL_MAX_OVERFLOW = int(os.getenv("AUGUR_POOL_MAX_OVERFLOW", "3"))
+
+# seconds after which a pooled connection is replaced, before the server or a proxy drops it.
+POOL_RECYCLE = int(os.getenv("AUGUR_POOL_RECYCLE", "1800"))
+
+# connection string -> engine, shared by every AugurManager in the process.
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def reset_engines():
+    """Drops the pooled connections a forked process inherited from its parent,
+    without closing them for the parent. The engines open new connections
+    in this process when they're next used.
+
+    Called in each Celery worker process when it starts.
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose(close=False)
+
 
 class AugurManager:
     """
@@ -45,17 +93,26 @@ class AugurManager:
     --------
         get_engine():
             Connects to Augur databse with supplied credentials and
-            returns engine object.
+            returns engine object, shared by the process.
 
-        run_query(query_string):
+        run_query(query_string, params):
             Runs a SQL-query against Augur database and returns resulting
-            Pandas dataframe.
+            Pandas dataframe. Parameterized queries are run as prepared statements.
+
+        stream_query(query_string, params, chunk_rows):
+            Runs a SQL-query against Augur database and yields its results
+            as Arrow record batches of at most chunk_rows rows.
+
+        copy_query(query_string, params, column_types):
+            Runs a SQL-query against Augur database with COPY and returns
+            resulting Arrow table, parsed without Python objects per value.
     """
 
     def __init__(self, handles_oauth=False):
         # sqlalchemy engine object
         self.engine = None
         self.initial_search_option = None
+        self.repo_size_estimates = {}
 
         # db connection credentials
         # if any are unavailable, raise error.
@@ -103,6 +160,10 @@ class AugurManager:
         """
         Creates _engine.Engine object connected to our Augur database.
 
+        Each process creates one engine, and one pool of connections, per set of
+        credentials and verifies it once. Later calls, e.g. by every query task
+        a worker runs, reuse it and check out an already open connection.
+
         Returns:
         --------
             _engine.Engine: SQLAlchemy engine object.
@@ -115,34 +176,57 @@ class AugurManager:
         database_connection_string = "postgresql+psycopg2://{}:{}@{}:{}/{}".format(
             self.user, self.password, self.host, self.port, self.database
         )
+        key = (database_connection_string, self.schema)
 
-        engine = salc.create_engine(
-            database_connection_string,
-            connect_args={"options": "-csearch_path={}".format(self.schema)},
-            pool_pre_ping=True,
-        )
-
-        # verify that engine works
-        try:
-            # context managed connect, closes automatically
-            with engine.connect() as conn:
-                logging.warning("AUGUR: Connection to DB succeeded")
-
+        engine = _engines.get(key)
+        if engine is not None:
             self.engine = engine
+            return engine
+
+        with _engines_lock:
+            if key in _engines:
+                self.engine = _engines[key]
+                return self.engine
+
+            engine = salc.create_engine(
+                database_connection_string,
+                connect_args={"options": "-csearch_path={}".format(self.schema)},
+                pool_pre_ping=True,
+                pool_size=POOL_SIZE,
+                max_overflow=POOL_MAX_OVERFLOW,
+                pool_recycle=POOL_RECYCLE,
+            )
+
+            # verify that engine works
+            try:
+                # context managed connect, returns the connection to the pool
+                with engine.connect() as conn:
+                    logging.warning("AUGUR: Connection to DB succeeded")
 
-        except SQLAlchemyError as err:
-            logging.error(f"AUGUR: DB couldn't connect: {err.__cause__}")
-            raise SQLAlchemyError(err)
+                self.engine = engine
+                _engines[key] = engine
+
+            except SQLAlchemyError as err:
+                logging.error(f"AUGUR: DB couldn't connect: {err.__cause__}")
+                raise SQLAlchemyError(err)
 
         return engine
 
-    def run_query(self, query_string: str) -> pd.DataFrame:
+    def run_query(self, query_string: str, params: dict = None) -> pd.DataFrame:
         """
         Runs SQL query against our Augur database.
 
+        Values are passed as bind parameters rather than written into the SQL,
+        e.g. repo ids as an array compared with '= ANY(:repo_ids)', so the text
+        of a query is the same for every call. Lists of ints are copied to the
+        server apart from the statement, see '_bind_arrays'. Parameterized
+        queries are prepared once per connection and their plans are reused by
+        later calls.
+
         Args:
         -----
             query_string (str): SQL query to run.
+            params (dict | None): values of the query's ':name' bind parameters.
 
         Returns:
         --------
@@ -158,15 +242,240 @@ class AugurManager:
 
         try:
             with self.engine.connect() as conn:
-                result_df = pd.read_sql(query, con=conn)
+                prepare = bool(params) and PREPARE_STATEMENTS
+                if params:
+                    query_string, params = self._bind_arrays(conn, query_string, params)
+                    query = salc.sql.text(query_string)
+                if prepare:
+                    result = conn.exec_driver_sql(self._prepare(conn, query_string, params), params)
+                    result_df = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()), coerce_float=True)
+                else:
+                    result_df = pd.read_sql(query, con=conn, params=params)
         except:
             raise Exception("DB Read Failure")
 
-        result_df = result_df.reset_index()
-        result_df.drop("index", axis=1, inplace=True)
-
+        # read_sql returns a RangeIndex already, no need to reset it.
         return result_df
 
+    def _bind_arrays(self, conn, query_string, params):
+        """
+        (private)
+        Sends the values of bind parameters that are lists of ints, e.g. repo ids,
+        to the server as the rows of a temporary table, and reads them in the query
+        from a subquery of that table in place of the parameter.
+
+        psycopg2 renders every parameter into the text of the statement on the
+        client, so an array of all of an org's repo ids would make statements
+        that grow with the org. COPY streams the values apart from any statement,
+        and the text of the query is the same for any number of them.
+
+        The tables are temporary to the connection, as are its prepared statements,
+        and are emptied on every call.
+
+        Args:
+        -----
+            conn (Connection): connection the query will run on
+            query_string (str): SQL query with ':name' bind parameters
+            params (dict): values of the bind parameters
+
+        Returns:
+        --------
+            str: query reading the lists from their tables
+            dict: values of the remaining bind parameters
+        """
+        arrays = {
+            name: values
+            for name, values in params.items()
+            if isinstance(values, (list, tuple))
+            and all(isinstance(v, numbers.Integral) and not isinstance(v, bool) for v in values)
+        }
+        if not arrays:
+            return query_string, params
+
+        cur = conn.connection.cursor()
+        try:
+            for name, values in arrays.items():
+                table = BIND_TABLE.format(name)
+                cur.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table} (v bigint)")
+                cur.execute(f"TRUNCATE {table}")
+                cur.copy_expert(f"COPY {table} (v) FROM STDIN", io.StringIO("".join(f"{int(v)}\n" for v in values)))
+        finally:
+            cur.close()
+
+        query_string = BIND_PARAM.sub(
+            lambda m: f"(SELECT array_agg(v) FROM pg_temp.{BIND_TABLE.format(m.group(1))})"
+            if m.group(1) in arrays
+            else m.group(0),
+            query_string,
+        )
+        return query_string, {k: v for k, v in params.items() if k not in arrays}
+
+    def _prepare(self, conn, query_string, params):
+        """
+        (private)
+        Prepares a query on the connection, unless it was prepared on it before.
+
+        Statements are named after a hash of their text and the names of the
+        statements prepared on a connection are kept with it in the pool,
+        so each connection parses and plans each query once.
+
+        Args:
+        -----
+            conn (Connection): connection the query will run on
+            query_string (str): SQL query with ':name' bind parameters
+            params (dict): values of the bind parameters
+
+        Returns:
+        --------
+            str: statement that executes the prepared query, in the driver's paramstyle.
+        """
+        names = []
+
+        def positional(m):
+            if m.group(1) not in params:
+                return m.group(0)
+            if m.group(1) not in names:
+                names.append(m.group(1))
+            return f"${names.index(m.group(1)) + 1}"
+
+        sql = BIND_PARAM.sub(positional, query_string).strip().rstrip(";")
+        stmt = "q_" + hashlib.md5(sql.encode("utf-8")).hexdigest()[:16]
+
+        # cleared when the connection is closed or invalidated, along with its statements.
+        prepared = conn.connection.info.setdefault("prepared", set())
+        if stmt not in prepared:
+            conn.execution_options(no_parameters=True).exec_driver_sql(f"PREPARE {stmt} AS {sql}")
+            prepared.add(stmt)
+
+        if not names:
+            return f"EXECUTE {stmt}"
+        return f"EXECUTE {stmt}({', '.join(f'%({n})s' for n in names)})"
+
+    def stream_query(self, query_string: str, params: dict = None, chunk_rows: int = STREAM_CHUNK_ROWS):
+        """
+        Runs SQL query against our Augur database, reading its results
+        from a server-side cursor a chunk of rows at a time.
+
+        Each chunk is converted to Arrow arrays as it arrives, so only one
+        chunk of rows is ever held as Python objects. A column's type is fixed
+        by the first chunk in which it has a value, later chunks are read as
+        that type. Queries with no results yield one empty batch, so that
+        the names of the columns are known.
+
+        Server-side cursors can't run prepared statements, streamed queries
+        are planned on every call. Lists of ints are copied to the server apart
+        from the statement, see '_bind_arrays'.
+
+        Args:
+        -----
+            query_string (str): SQL query to run.
+            params (dict | None): values of the query's ':name' bind parameters.
+            chunk_rows (int): rows fetched from the cursor at a time.
+
+        Yields:
+        -------
+            pa.RecordBatch: Results from SQL query, chunk_rows rows at a time.
+        """
+        if self.engine is None:
+            logging.critical("No engine- please use 'get_engine' method to create engine.")
+            return
+
+        try:
+            with self.engine.connect() as conn:
+                if params:
+                    query_string, params = self._bind_arrays(conn, query_string, params)
+                query = salc.sql.text(query_string)
+
+                # psycopg2 uses a named (server-side) cursor for streamed results.
+                result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(query, params or {})
+                names = list(result.keys())
+
+                types = {}
+                empty = True
+                for rows in result.partitions(chunk_rows):
+                    empty = False
+
+                    arrays = []
+                    for name, values in zip(names, zip(*rows)):
+                        try:
+                            arr = pa.array(values, type=types.get(name), from_pandas=True)
+                        except (pa.ArrowInvalid, pa.ArrowTypeError):
+                            # values Arrow has no type for, e.g. UUIDs, are read as text.
+                            types[name] = pa.string()
+                            arr = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+                        if name not in types and arr.type != pa.null():
+                            types[name] = arr.type
+                        arrays.append(arr)
+                    del rows
+
+                    yield pa.RecordBatch.from_arrays(arrays, names=names)
+
+                if empty:
+                    yield pa.RecordBatch.from_arrays([pa.array([], type=pa.null()) for _ in names], names=names)
+        except SQLAlchemyError as err:
+            raise Exception("DB Read Failure") from err
+
+    def copy_query(self, query_string: str, params: dict = None, column_types: dict = None) -> pa.Table:
+        """
+        Runs SQL query against our Augur database as 'COPY (query) TO STDOUT'.
+
+        The server writes the results as CSV, which is spooled to a temporary
+        file and parsed into Arrow arrays by Arrow's multi-threaded CSV reader,
+        so no Python object is created per value as with read_sql. Column types
+        are inferred from the whole result; columns whose text could be read as
+        another type, e.g. dates stored as text, should be given in column_types.
+
+        COPY can't take bind parameters, so their values are rendered into the
+        query by the driver, except lists of ints, see '_bind_arrays'.
+
+        Args:
+        -----
+            query_string (str): SQL query to run.
+            params (dict | None): values of the query's ':name' bind parameters.
+            column_types (dict{str: pa.DataType} | None): types of columns that shouldn't be inferred.
+
+        Returns:
+        --------
+            pa.Table: Results from SQL query.
+        """
+        if self.engine is None:
+            logging.critical("No engine- please use 'get_engine' method to create engine.")
+            return None
+
+        params = params or {}
+
+        # NULL is an unquoted empty field, an empty string is a quoted one.
+        convert_options = pacsv.ConvertOptions(
+            column_types=column_types or {},
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+            true_values=["t"],
+            false_values=["f"],
+        )
+
+        try:
+            with self.engine.connect() as conn:
+                if params:
+                    query_string, params = self._bind_arrays(conn, query_string, params)
+                sql = BIND_PARAM.sub(lambda m: f"%({m.group(1)})s" if m.group(1) in params else m.group(0), query_string)
+                sql = sql.strip().rstrip(";")
+
+                cur = conn.connection.cursor()
+                try:
+                    if params:
+                        sql = cur.mogrify(sql, params).decode("utf-8")
+
+                    with tempfile.TemporaryFile() as buf:
+                        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", buf)
+                        buf.seek(0)
+                        table = pacsv.read_csv(buf, convert_options=convert_options)
+                finally:
+                    cur.close()
+        except Exception as err:
+            raise Exception("DB Read Failure") from err
+
+        return table
+
     def multiselect_startup(self):
         logging.warning(f"MULTISELECT_STARTUP")
 
@@ -218,8 +527,59 @@ class AugurManager:
         # self.repo_id_to_repo_git = {value: key for (key, value) in self.repo_git_to_repo_id.items()}
         self.repo_id_to_repo_git = pd.Series(df_repo_git_id.repo_git.values, index=df_repo_git_id["repo_id"]).to_dict()
 
+        self.repo_size_startup()
+
         logging.warning(f"MULTISELECT_FINISHED")
 
+    def repo_size_startup(self):
+        """Loads an estimate of the number of rows each repo has,
+        the sum of its commits, issues and pull requests as last
+        collected by Augur. Used to balance the repos of a large
+        selection across query tasks.
+
+        Repos without a collected estimate, or with only zero counts,
+        are left out and estimated by 'repo_sizes'.
+        """
+        query_string = """SELECT DISTINCT ON (ri.repo_id)
+                            ri.repo_id,
+                            coalesce(ri.commit_count, 0)
+                                + coalesce(ri.issues_count, 0)
+                                + coalesce(ri.pull_request_count, 0) AS size
+                        FROM
+                            augur_data.repo_info ri
+                        ORDER BY ri.repo_id, ri.data_collection_date DESC"""
+
+        try:
+            df_sizes = self.run_query(query_string)
+        except Exception as err:
+            # every repo is estimated at DEFAULT_REPO_ROWS instead.
+            logging.error(f"REPO_SIZE_STARTUP - COULDN'T LOAD ESTIMATES: {err}")
+            return
+
+        # zero counts mean the repo wasn't collected yet rather than that it's empty.
+        df_sizes = df_sizes[df_sizes["size"] > 0]
+        self.repo_size_estimates = pd.Series(df_sizes["size"].values, index=df_sizes["repo_id"]).to_dict()
+
+    def repo_sizes(self, repos):
+        """Estimated number of rows of each repo.
+
+        Repos without an estimate are assumed to be as large as the
+        average repo of the selection that has one, or DEFAULT_REPO_ROWS
+        if none of them has one.
+
+        Args:
+            repos ([int]): repo_ids
+
+        Returns:
+            [int]: estimate of each repo, in the order of repos.
+        """
+        sizes = [self.repo_size_estimates.get(r) or None for r in repos]
+
+        known = [s for s in sizes if s is not None]
+        default = max(1, int(sum(known) // len(known))) if known else DEFAULT_REPO_ROWS
+
+        return [default if s is None else max(1, int(s)) for s in sizes]
+
     def repo_git_to_id(self, git):
         """Getter method for dictionary
         that converts a git URL to the respective
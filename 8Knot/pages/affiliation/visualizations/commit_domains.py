@@ -11,6 +11,7 @@ from pages.utils.graph_utils import color_seq
 from queries.commits_query import commits_query as cq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 import datetime as dt
@@ -132,12 +133,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[cq])
 def commit_domains_graph(repolist, num, start_date, end_date):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=cq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=cq, repos=repolist)
         df = cache.grabm(func=cq, repos=repolist)
 
     start = time.perf_counter()
@@ -11,6 +11,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.contributors_query import contributors_query as ctq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 import datetime as dt
@@ -229,6 +230,7 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def project_velocity_graph(
     repolist, log, i_o_weight, i_c_weight, pr_o_weight, pr_m_weight, pr_c_weight, start_date, end_date
 ):
@@ -237,7 +239,7 @@ def project_velocity_graph(
     cache = cm()
     df = cache.grabm(func=ctq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=ctq, repos=repolist)
         df = cache.grabm(func=ctq, repos=repolist)
 
     start = time.perf_counter()
@@ -11,6 +11,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.pr_assignee_query import pr_assignee_query as praq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 import datetime as dt
@@ -145,12 +146,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[praq])
 def cntrib_pr_assignment_graph(repolist, interval, assign_req):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=praq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=praq, repos=repolist)
         df = cache.grabm(func=praq, repos=repolist)
 
     start = time.perf_counter()
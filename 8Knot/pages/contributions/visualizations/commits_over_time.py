@@ -9,6 +9,7 @@ import plotly.express as px
 from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.commits_query import commits_query as cmq
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import io
 import time
@@ -114,12 +115,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[cmq])
 def commits_over_time_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=cmq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=cmq, repos=repolist)
         df = cache.grabm(func=cmq, repos=repolist)
 
     # data ready.
@@ -13,6 +13,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.issues_query import issues_query as iq
 from pages.utils.job_utils import nodata_graph
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 import io
 import time
 
@@ -164,6 +165,7 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[iq])
 def new_staling_issues_graph(repolist, interval, staling_interval, stale_interval):
     # conditional for the intervals to be valid options
     if staling_interval > stale_interval:
@@ -176,7 +178,7 @@ def new_staling_issues_graph(repolist, interval, staling_interval, stale_interva
     cache = cm()
     df = cache.grabm(func=iq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=iq, repos=repolist)
         df = cache.grabm(func=iq, repos=repolist)
 
     start = time.perf_counter()
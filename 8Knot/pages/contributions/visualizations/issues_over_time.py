@@ -10,6 +10,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from pages.utils.job_utils import nodata_graph
 from queries.issues_query import issues_query as iq
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 import io
 import time
 
@@ -114,12 +115,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[iq])
 def issues_over_time_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=iq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=iq, repos=repolist)
         df = cache.grabm(func=iq, repos=repolist)
 
     # data ready.
@@ -11,6 +11,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.pr_response_query import pr_response_query as prr
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
@@ -111,12 +112,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[prr])
 def pr_first_response_graph(repolist, num_days):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=prr, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=prr, repos=repolist)
         df = cache.grabm(func=prr, repos=repolist)
 
     start = time.perf_counter()
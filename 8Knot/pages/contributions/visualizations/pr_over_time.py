@@ -12,6 +12,7 @@ import io
 from pages.utils.job_utils import nodata_graph
 from queries.prs_query import prs_query as prq
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 import time
 
 PAGE = "contributions"
@@ -115,12 +116,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[prq])
 def prs_over_time_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=prq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=prq, repos=repolist)
         df = cache.grabm(func=prq, repos=repolist)
 
     # data ready.
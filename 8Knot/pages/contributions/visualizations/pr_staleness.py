@@ -14,6 +14,7 @@ from queries.prs_query import prs_query as prq
 import time
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 
 PAGE = "contributions"
 VIZ_ID = "pr-staleness"
@@ -162,6 +163,7 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[prq])
 def new_staling_prs_graph(repolist, interval, staling_interval, stale_interval):
     # conditional for the intervals to be valid options
     if staling_interval > stale_interval:
@@ -174,7 +176,7 @@ def new_staling_prs_graph(repolist, interval, staling_interval, stale_interval):
     cache = cm()
     df = cache.grabm(func=prq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=prq, repos=repolist)
         df = cache.grabm(func=prq, repos=repolist)
 
     start = time.perf_counter()
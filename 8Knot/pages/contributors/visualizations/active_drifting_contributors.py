@@ -11,12 +11,16 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.contributors_query import contributors_query as ctq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
 PAGE = "contributors"
 VIZ_ID = "active-drifting-contributors"
 
+# columns of the query's results used by this visualization
+COLUMNS = ["cntrb_id", "created_at"]
+
 gc_active_drifting_contributors = dbc.Card(
     [
         dbc.CardBody(
@@ -161,6 +165,7 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def active_drifting_contributors_graph(repolist, interval, drift_interval, away_interval):
     # conditional for the intervals to be valid options
     if drift_interval is None or away_interval is None:
@@ -171,10 +176,10 @@ def active_drifting_contributors_graph(repolist, interval, drift_interval, away_
 
     # wait for data to asynchronously download and become available.
     cache = cm()
-    df = cache.grabm(func=ctq, repos=repolist)
+    df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
     while df is None:
-        time.sleep(1.0)
-        df = cache.grabm(func=ctq, repos=repolist)
+        cache.wait(func=ctq, repos=repolist)
+        df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
 
     logging.warning(f"ACTIVE_DRIFTING_CONTRIBUTOR_GROWTH_VIZ - START")
     start = time.perf_counter()
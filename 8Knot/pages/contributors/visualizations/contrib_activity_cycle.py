@@ -11,12 +11,16 @@ from pages.utils.graph_utils import color_seq
 from queries.commits_query import commits_query as cmq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
 PAGE = "contributors"
 VIZ_ID = "contrib-activity-cycle"
 
+# columns of the query's results used by this visualization
+COLUMNS = ["author_timestamp", "committer_timestamp"]
+
 
 gc_contrib_activity_cycle = dbc.Card(
     [
@@ -112,13 +116,14 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[cmq])
 def contrib_activity_cycle_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
-    df = cache.grabm(func=cmq, repos=repolist)
+    df = cache.grabm(func=cmq, repos=repolist, columns=COLUMNS)
     while df is None:
-        time.sleep(1.0)
-        df = cache.grabm(func=cmq, repos=repolist)
+        cache.wait(func=cmq, repos=repolist)
+        df = cache.grabm(func=cmq, repos=repolist, columns=COLUMNS)
 
     start = time.perf_counter()
     logging.warning(f"{VIZ_ID}- START")
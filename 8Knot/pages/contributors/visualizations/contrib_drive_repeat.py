@@ -12,10 +12,14 @@ from queries.contributors_query import contributors_query as ctq
 import time
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 
 PAGE = "contributors"
 VIZ_ID = "contrib-drive-repeat"
 
+# columns of the query's results used by this visualization
+COLUMNS = ["cntrb_id", "created_at", "rank", "Action"]
+
 gc_contrib_drive_repeat = dbc.Card(
     [
         dbc.CardBody(
@@ -153,13 +157,14 @@ def graph_title(view):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def repeat_drive_by_graph(repolist, contribs, view):
     # wait for data to asynchronously download and become available.
     cache = cm()
-    df = cache.grabm(func=ctq, repos=repolist)
+    df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
     while df is None:
-        time.sleep(1.0)
-        df = cache.grabm(func=ctq, repos=repolist)
+        cache.wait(func=ctq, repos=repolist)
+        df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
 
     # data ready.
     start = time.perf_counter()
@@ -14,6 +14,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.contributors_query import contributors_query as ctq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 import datetime as dt
@@ -231,6 +232,7 @@ def graph_title(window_width):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def create_contrib_prolificacy_over_time_graph(
     repolist, patterns, threshold, window_width, step_size, start_date, end_date
 ):
@@ -239,7 +241,7 @@ def create_contrib_prolificacy_over_time_graph(
     df = cache.grabm(func=ctq, repos=repolist)
 
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=ctq, repos=repolist)
         df = cache.grabm(func=ctq, repos=repolist)
 
     # data ready.
@@ -13,6 +13,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.contributors_query import contributors_query as ctq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 import datetime as dt
@@ -213,12 +214,13 @@ def graph_title(k, action_type):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def create_top_k_cntrbs_graph(repolist, action_type, top_k, patterns, start_date, end_date):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=ctq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=ctq, repos=repolist)
         df = cache.grabm(func=ctq, repos=repolist)
 
     start = time.perf_counter()
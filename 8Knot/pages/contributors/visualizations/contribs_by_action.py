@@ -11,6 +11,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.contributors_query import contributors_query as ctq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
@@ -18,6 +19,9 @@ import time
 PAGE = "contributors"
 VIZ_ID = "contribs-by-action"
 
+# columns of the query's results used by this visualization
+COLUMNS = ["created_at", "Action"]
+
 gc_contribs_by_action = dbc.Card(
     [
         dbc.CardBody(
@@ -153,14 +157,15 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def contribs_by_action_graph(repolist, interval, action):
 
     # wait for data to asynchronously download and become available.
     cache = cm()
-    df = cache.grabm(func=ctq, repos=repolist)
+    df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
     while df is None:
-        time.sleep(1.0)
-        df = cache.grabm(func=ctq, repos=repolist)
+        cache.wait(func=ctq, repos=repolist)
+        df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
 
     start = time.perf_counter()
     logging.warning(f"{VIZ_ID}- START")
@@ -14,6 +14,7 @@ from queries.contributors_query import contributors_query as ctq
 import time
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 
 PAGE = "contributors"
 VIZ_ID = "contrib-types-over-time"
@@ -137,12 +138,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def create_contrib_over_time_graph(repolist, contribs, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=ctq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=ctq, repos=repolist)
         df = cache.grabm(func=ctq, repos=repolist)
 
     start = time.perf_counter()
@@ -9,6 +9,7 @@ import plotly.express as px
 from pages.utils.graph_utils import color_seq
 from queries.contributors_query import contributors_query as ctq
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 import io
 import time
 from pages.utils.job_utils import nodata_graph
@@ -16,6 +17,9 @@ from pages.utils.job_utils import nodata_graph
 PAGE = "contributors"
 VIZ_ID = "first-time-contribution"
 
+# columns of the query's results used by this visualization
+COLUMNS = ["created_at", "rank", "Action"]
+
 gc_first_time_contributions = dbc.Card(
     [
         dbc.CardBody(
@@ -77,13 +81,14 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def create_first_time_contributors_graph(repolist):
     # wait for data to asynchronously download and become available.
     cache = cm()
-    df = cache.grabm(func=ctq, repos=repolist)
+    df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
     while df is None:
-        time.sleep(1.0)
-        df = cache.grabm(func=ctq, repos=repolist)
+        cache.wait(func=ctq, repos=repolist)
+        df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
 
     start = time.perf_counter()
     logging.warning("CONTRIB_DRIVE_REPEAT_VIZ - START")
@@ -10,12 +10,16 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.contributors_query import contributors_query as ctq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
 PAGE = "contributors"
 VIZ_ID = "new-contributor"
 
+# columns of the query's results used by this visualization
+COLUMNS = ["cntrb_id", "created_at", "rank"]
+
 gc_new_contributor = dbc.Card(
     [
         dbc.CardBody(
@@ -124,13 +128,14 @@ def graph_title(view):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[ctq])
 def new_contributor_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
-    df = cache.grabm(func=ctq, repos=repolist)
+    df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
     while df is None:
-        time.sleep(1.0)
-        df = cache.grabm(func=ctq, repos=repolist)
+        cache.wait(func=ctq, repos=repolist)
+        df = cache.grabm(func=ctq, repos=repolist, columns=COLUMNS)
 
     logging.warning("TOTAL_CONTRIBUTOR_GROWTH_VIZ - START")
     start = time.perf_counter()
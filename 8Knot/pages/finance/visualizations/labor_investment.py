@@ -16,6 +16,7 @@ from queries.issues_query import issues_query as iq
 
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
@@ -118,6 +119,7 @@ def toggle_popover(n, is_open):
 )
 
 ## Data Preprocessing?
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[prq, cq, iq])
 def labor_investment_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
@@ -125,13 +127,13 @@ def labor_investment_graph(repolist, interval):
     df2 = cache.grabm(func=cq, repos=repolist) # from queries.commits_query import commits_query as cq
     df3 = cache.grabm(func=iq, repos=repolist) # from queries.issues_query import issues_query as iq
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=prq, repos=repolist)
         df = cache.grabm(func=prq, repos=repolist)
     while df2 is None:
-        time.sleep(1.0)
+        cache.wait(func=cq, repos=repolist)
         df2 = cache.grabm(func=cq, repos=repolist)
     while df3 is None:
-        time.sleep(1.0)
+        cache.wait(func=iq, repos=repolist)
         df3 = cache.grabm(func=iq, repos=repolist)
 
     start = time.perf_counter()
@@ -12,6 +12,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.bus_factor_query import bus_factor_query as bfq
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 import datetime as dt 
@@ -149,12 +150,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[bfq])
 def time_to_first_response_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=bfq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=bfq, repos=repolist)
         df = cache.grabm(func=bfq, repos=repolist)
 
     start = time.perf_counter()
@@ -11,6 +11,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.prs_query import prs_query as prq ## BNE : Using same query as pr_over_time.py
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
@@ -147,12 +148,13 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[prq])
 def change_request_closure_ratio_graph(repolist, interval): # 
     # wait for data to asynchronously download and become available.
     cache = cm()
     df = cache.grabm(func=prq, repos=repolist)
     while df is None:
-        time.sleep(1.0)
+        cache.wait(func=prq, repos=repolist)
         df = cache.grabm(func=prq, repos=repolist)  
 
     start = time.perf_counter()
@@ -2,7 +2,9 @@ from dash import html, dcc
 import dash_bootstrap_components as dbc
 from dash import callback
 from dash.dependencies import Input, Output, State
-from db_manager.augur_manager import AugurManager
+from queries.home_metrics_query import home_metrics_query as hmq
+from queries.commits_query import commits_query as cmq
+from cache_manager.cache_manager import CacheManager as cm
 
 # card for commit total for selected repos
 commit_total = dbc.Card(
@@ -109,126 +111,55 @@ gc_commit_metrics = dbc.Card(
 )
 
 
-# callbacks below are for the specific queries for these cards
+# callback below computes these cards from the cached metrics of each repo
 
 
 @callback(
     Output("commit-count", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def commit_count(repolist):
-    """Queries Augur for the count of commits for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            /*commit_hash'es are unique per commit*/
-            count(distinct c.cmt_commit_hash) as num_commits
-        from
-            augur_data.commits c,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and c.repo_id = r.repo_id
-        """
-    )
-
-    return df.iat[0, 0]
-
-
-@callback(
     Output("commit-lines-added", "children"),
     Output("commit-lines-removed", "children"),
+    Output("files-per-commit", "children"),
     [
         Input("repo-choices", "data"),
     ],
     background=True,
 )
-def commit_lines_delta(repolist):
-    """Queries Augur for the average number of lines added per commit
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-            select
-                round(avg(l_delta.lines_added), 2) as avg_lines_added, round(avg(l_delta.lines_removed), 2) as avg_lines_removed
-            from
-                /*
-                * For each commit, get the total number of lines added/removed across all files in commit.
-                * */
-                (select
-                    sum(c.cmt_added) as lines_added, sum(c.cmt_removed) as lines_removed
-                from
-                    augur_data.commits c,
-                    augur_data.repo r
-                where
-                    r.repo_id in ({str(repolist)[1:-1]})
-                    and c.repo_id = r.repo_id
-                group by c.cmt_commit_hash) as l_delta
-        """
-    )
-
-    return df.iat[0, 0], df.iat[0, 1]
+def commit_metrics(repolist):
+    """Aggregates the commit metrics of the repos in repolist:
+    the count of commits and the average lines added, lines removed
+    and files changed per commit.
 
+    Commits that are in several of the repos, e.g. in forks and mirrors
+    within an org, are counted once: the count is of the distinct commit
+    hashes in the cached results of the commits query. The averages are
+    over the commits of each repo, to which a commit that's in several
+    repos contributes the same lines and files every time.
 
-@callback(
-    Output("files-per-commit", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def files_per_commit(repolist):
-    """Queries Augur for the number of files per commit for repos in repolist
     Args:
         repolist ([int]): list of the repos queried
     """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            avg(f.num_files) as avg_files
-        from
-            (select
-                /*commit_hash'es are unique per commit*/
-                count(*) as num_files
-            from
-                augur_data.commits c,
-                augur_data.repo r
-            where
-                r.repo_id in ({str(repolist)[1:-1]})
-                and c.repo_id = r.repo_id
-            group by c.cmt_commit_hash) as f
-        """
+    # wait for data to asynchronously download and become available.
+    cache = cm()
+    df = cache.grabm(func=hmq, repos=repolist)
+    while df is None:
+        cache.wait(func=hmq, repos=repolist)
+        df = cache.grabm(func=hmq, repos=repolist)
+
+    totals = df.sum(numeric_only=True)
+
+    # commits per repo, counting commits that are in several repos once for each.
+    commits = int(totals["commits"])
+    if commits == 0:
+        return 0, None, None, None
+
+    hashes = cache.grabm(func=cmq, repos=repolist, columns=["commits"])
+    while hashes is None:
+        cache.wait(func=cmq, repos=repolist)
+        hashes = cache.grabm(func=cmq, repos=repolist, columns=["commits"])
+
+    return (
+        hashes["commits"].nunique(),
+        round(totals["lines_added"] / commits, 2),
+        round(totals["lines_removed"] / commits, 2),
+        round(totals["commit_files"] / commits, 2),
     )
-
-    return round(df.iat[0, 0], 2)
@@ -2,7 +2,8 @@ from dash import html, dcc
 import dash_bootstrap_components as dbc
 from dash import callback
 from dash.dependencies import Input, Output, State
-from db_manager.augur_manager import AugurManager
+from queries.home_metrics_query import home_metrics_query as hmq
+from cache_manager.cache_manager import CacheManager as cm
 import numpy as np
 import pandas as pd
 
@@ -111,94 +112,63 @@ gc_issue_metrics = dbc.Card(
     ],
 )
 
-# callbacks below are for the specific queries for these cards
+# callback below computes these cards from the cached metrics of each repo
 
 
 @callback(
+    Output("open-issue-count", "children"),
+    Output("closed-issue-count", "children"),
+    Output("avg-open-issue-age", "children"),
     Output("avg-closed-issue-age", "children"),
     [
         Input("repo-choices", "data"),
     ],
     background=True,
 )
-def avg_closed_issue_age(repolist):
-    """Queries Augur for the avg age of closed issues for repos in repolist
+def issue_metrics(repolist):
+    """Aggregates the issue metrics of the repos in repolist:
+    the counts of open and closed issues and their average ages.
+
     Args:
         repolist ([int]): list of the repos queried
     """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            avg(now() - i.created_at) as difference
-        from
-            augur_data.issues i,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and i.repo_id = r.repo_id
-            and i.closed_at is not null
-        """
+    # wait for data to asynchronously download and become available.
+    cache = cm()
+    df = cache.grabm(func=hmq, repos=repolist)
+    while df is None:
+        cache.wait(func=hmq, repos=repolist)
+        df = cache.grabm(func=hmq, repos=repolist)
+
+    totals = df.sum(numeric_only=True)
+    now = pd.Timestamp.now(tz="UTC").timestamp()
+
+    # issues are as old as the time since they were created, on average.
+    open_age = None
+    if totals["open_issues"]:
+        open_age = now - totals["open_issue_created"] / totals["open_issues"]
+
+    closed_age = None
+    if totals["closed_issues"]:
+        closed_age = now - totals["closed_issue_created"] / totals["closed_issues"]
+
+    return (
+        int(totals["open_issues"]),
+        int(totals["closed_issues"]),
+        _format_age(open_age),
+        _format_age(closed_age),
     )
 
-    # timedelta object
-    diff = df.iat[0, 0]
-
-    # days component
-    diff_days = diff.days
-
-    # timedelta representation of # of days to get hours
-    days_delta = pd.Timedelta(days=diff_days)
-
-    # gives remaining hours
-    diff_hours = (diff - days_delta) / np.timedelta64(1, "h")
-
-    return f"{diff_days} days, {round(diff_hours, 1)} hours"
-
 
-@callback(
-    Output("avg-open-issue-age", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def avg_open_issue_age(repolist):
-    """Queries Augur for the avg age of open issues for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
+def _format_age(seconds):
     """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            avg(now() - i.created_at) as difference
-        from
-            augur_data.issues i,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and i.repo_id = r.repo_id
-            and i.closed_at is null
-        """
-    )
+    (private)
+    Formats an age in seconds as days and hours.
+    """
+    if seconds is None:
+        return None
 
     # timedelta object
-    diff = df.iat[0, 0]
+    diff = pd.Timedelta(seconds=seconds)
 
     # days component
     diff_days = diff.days
@@ -210,77 +180,3 @@ def avg_open_issue_age(repolist):
     diff_hours = (diff - days_delta) / np.timedelta64(1, "h")
 
     return f"{diff_days} days, {round(diff_hours, 1)} hours"
-
-
-@callback(
-    Output("closed-issue-count", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def closed_issue_count(repolist):
-    """Queries Augur for the count of closed issues for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            count(distinct i.issue_id) as num_open_issues
-        from
-            augur_data.issues i,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and i.repo_id = r.repo_id
-            and i.closed_at is not null
-        """
-    )
-
-    return df.iat[0, 0]
-
-
-@callback(
-    Output("open-issue-count", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def open_issue_count(repolist):
-    """Queries Augur for the count of open issues for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            count(distinct i.issue_id) as num_open_issues
-        from
-            augur_data.issues i,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and i.repo_id = r.repo_id
-            and i.closed_at is null
-        """
-    )
-
-    return df.iat[0, 0]
@@ -5,7 +5,8 @@ from dash.dependencies import Input, Output, State
 import pandas as pd
 import numpy as np
 import logging
-from db_manager.augur_manager import AugurManager
+from queries.home_metrics_query import home_metrics_query as hmq
+from cache_manager.cache_manager import CacheManager as cm
 
 # card for number of open prs in the selected repo set
 pr_open = dbc.Card(
@@ -164,205 +165,71 @@ gc_pr_metrics = dbc.Card(
     ],
 )
 
-# callbacks below are for the specific queries for these cards
-@callback(
-    Output("open-pr-count", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def pr_count(repolist):
-    """Queries Augur for the count of open prs for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            count(distinct pr.pull_request_id) as num_open_prs
-        from
-            augur_data.pull_requests pr,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and pr.repo_id = r.repo_id
-            and pr.pr_closed_at is null
-        """
-    )
-
-    return df.iat[0, 0]
+# callback below computes these cards from the cached metrics of each repo
 
 
 @callback(
+    Output("open-pr-count", "children"),
     Output("merged-pr-count", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def merged_pr_count(repolist):
-    """Queries Augur for the count of merged prs for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            count(distinct pr.pull_request_id) as num_open_prs
-        from
-            augur_data.pull_requests pr,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and pr.repo_id = r.repo_id
-            and pr.pr_merged_at is not null
-        """
-    )
-
-    return df.iat[0, 0]
-
-
-@callback(
     Output("rejected-pr-count", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def rejected_pr_count(repolist):
-    """Queries Augur for the count of unmerged but closed prs for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            count(distinct pr.pull_request_id) as num_open_prs
-        from
-            augur_data.pull_requests pr,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and pr.repo_id = r.repo_id
-            and pr.pr_merged_at is null
-            and pr.pr_closed_at is not null
-        """
-    )
-
-    return df.iat[0, 0]
-
-
-@callback(
     Output("avg-open-pr-age", "children"),
+    Output("avg-merged-pr-age", "children"),
+    Output("avg-pr-messages", "children"),
     [
         Input("repo-choices", "data"),
     ],
     background=True,
 )
-def avg_open_pr_age(repolist):
-    """Queries Augur for the average age of open PRs for repos in repolist
+def pr_metrics(repolist):
+    """Aggregates the PR metrics of the repos in repolist:
+    the counts of open, merged and unmerged but closed PRs, the average
+    ages of open and merged PRs and the average # of messages on PRs.
+
     Args:
         repolist ([int]): list of the repos queried
     """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            avg(now() - pr.pr_created_at) as difference
-        from
-            augur_data.pull_requests pr,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and pr.repo_id = r.repo_id
-            and pr.pr_closed_at is null
-        """
+    # wait for data to asynchronously download and become available.
+    cache = cm()
+    df = cache.grabm(func=hmq, repos=repolist)
+    while df is None:
+        cache.wait(func=hmq, repos=repolist)
+        df = cache.grabm(func=hmq, repos=repolist)
+
+    totals = df.sum(numeric_only=True)
+
+    # open PRs are as old as the time since they were created, on average.
+    open_age = None
+    if totals["open_prs"]:
+        open_age = pd.Timestamp.now(tz="UTC").timestamp() - totals["open_pr_created"] / totals["open_prs"]
+
+    merged_age = None
+    if totals["closed_merged_prs"]:
+        merged_age = totals["merged_pr_age"] / totals["closed_merged_prs"]
+
+    avg_messages = None
+    if totals["messaged_prs"]:
+        avg_messages = round(totals["pr_messages"] / totals["messaged_prs"], 2)
+
+    return (
+        int(totals["open_prs"]),
+        int(totals["merged_prs"]),
+        int(totals["rejected_prs"]),
+        _format_age(open_age),
+        _format_age(merged_age),
+        avg_messages,
     )
 
-    # timedelta object
-    diff = df.iat[0, 0]
 
-    # days component
-    diff_days = diff.days
-
-    # timedelta representation of # of days to get hours
-    days_delta = pd.Timedelta(days=diff_days)
-
-    # gives remaining hours
-    diff_hours = (diff - days_delta) / np.timedelta64(1, "h")
-
-    return f"{diff_days} days, {round(diff_hours, 1)} hours"
-
-
-@callback(
-    Output("avg-merged-pr-age", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def avg_merged_pr_age(repolist):
-    """Queries Augur for the average age of merged PRs for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
+def _format_age(seconds):
     """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            avg(pr.pr_merged_at - pr.pr_created_at) as difference
-        from
-            augur_data.pull_requests pr,
-            augur_data.repo r
-        where
-            r.repo_id in ({str(repolist)[1:-1]})
-            and pr.repo_id = r.repo_id
-            and pr.pr_closed_at is not null
-            and pr.pr_merged_at is not null
-        """
-    )
+    (private)
+    Formats an age in seconds as days and hours.
+    """
+    if seconds is None:
+        return None
 
     # timedelta object
-    diff = df.iat[0, 0]
+    diff = pd.Timedelta(seconds=seconds)
 
     # days component
     diff_days = diff.days
@@ -374,49 +241,3 @@ def avg_merged_pr_age(repolist):
     diff_hours = (diff - days_delta) / np.timedelta64(1, "h")
 
     return f"{diff_days} days, {round(diff_hours, 1)} hours"
-
-
-@callback(
-    Output("avg-pr-messages", "children"),
-    [
-        Input("repo-choices", "data"),
-    ],
-    background=True,
-)
-def rejected_pr_count(repolist):
-    """Queries Augur for the average # of messages on all PRs for repos in repolist
-    Args:
-        repolist ([int]): list of the repos queried
-    """
-
-    # create augurmanager, should get creds from environment
-    db = AugurManager()
-
-    # create engine object from creds
-    db.get_engine()
-
-    # run query
-    df = db.run_query(
-        f"""
-        select
-            avg(prmc.message_count) as avg_message_count
-        from
-            /*
-            * count the number of unique message ID's for each PR
-            * */
-            (select
-                count(distinct prmr.msg_id) message_count
-            from
-                augur_data.pull_requests pr,
-                augur_data.pull_request_message_ref prmr,
-                augur_data.repo r
-            where
-                r.repo_id in ({str(repolist)[1:-1]})
-                and pr.repo_id = r.repo_id
-                and prmr.pull_request_id = pr.pull_request_id
-            group by pr.pull_request_id
-            ) as prmc
-        """
-    )
-
-    return round(df.iat[0, 0], 2)
@@ -1,17 +1,21 @@
 from datetime import datetime, timedelta
 import re
 import os
-import time
 import logging
 import json
-from celery.result import AsyncResult
+from celery import group
+from celery.result import AsyncResult, ResultSet
+from celery.exceptions import TimeoutError
+from celery.utils import uuid
 import dash_bootstrap_components as dbc
 import dash
 from dash import callback
 from dash.dependencies import Input, Output, State
 from app import augur
+from _celery import INTERACTIVE_QUEUE, BULK_QUEUE
 from flask_login import current_user
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.connections import users_client
 from queries.issues_query import issues_query as iq
 from queries.commits_query import commits_query as cq
 from queries.contributors_query import contributors_query as cnq
@@ -23,12 +27,39 @@ from queries.user_groups_query import user_groups_query as ugq
 from queries.pr_response_query import pr_response_query as prr
 from queries.bus_factor_query import bus_factor_query as bfq 
 from queries.releases_query import release_frequencey_query as rfq
+from queries.home_metrics_query import home_metrics_query as hmq
+from queries.query_utils import balanced_chunks
+from queries.refresh_query import refresh_query  # registers the scheduled refresh with the workers
+from queries.warm_query import warm_query  # registers the scheduled warming with the workers
+from queries.prune_query import prune_query  # registers the scheduled pruning with the workers
 import redis
 import flask
 
 
 # list of queries to be run
-QUERIES = [iq, cq, cnq, prq, cmq, iaq, praq, prr, bfq, rfq]
+QUERIES = [iq, cq, cnq, prq, cmq, iaq, praq, prr, bfq, rfq, hmq]
+
+# query name -> query, for queries referenced in the job-ids store
+QUERIES_BY_NAME = {f.__name__: f for f in QUERIES}
+
+# estimated rows fetched by one query task. larger selections are split across
+# several tasks that run on the query workers in parallel.
+FANOUT_ROWS = int(os.getenv("QUERY_FANOUT_ROWS", "500000"))
+
+# most tasks a selection is split across, per query.
+FANOUT_MAX_TASKS = int(os.getenv("QUERY_FANOUT_MAX_TASKS", "8"))
+
+# estimated rows of a query's selection up to which its tasks are interactive.
+# larger selections are bulk loads, run on the workers that aren't reserved
+# for interactive loads so they can't hold small searches up.
+INTERACTIVE_ROWS = int(os.getenv("QUERY_INTERACTIVE_ROWS", "200000"))
+
+# repos of a query's selection up to which its tasks are interactive, whatever
+# their estimated rows, so selections of repos without estimates are bulk loads too.
+INTERACTIVE_REPOS = int(os.getenv("QUERY_INTERACTIVE_REPOS", "50"))
+
+# seconds between updates of the share of results that are loaded.
+PROGRESS_INTERVAL = 2
 
 # check if login has been enabled in config
 login_enabled = os.getenv("AUGUR_LOGIN_ENABLED", "False") == "True"
@@ -54,13 +85,10 @@ def kick_off_group_collection(url, n_clicks):
     """
     if current_user.is_authenticated:
         user_id = current_user.get_id()
-        users_cache = redis.StrictRedis(
-            host=os.getenv("REDIS_SERVICE_USERS_HOST", "redis-users"),
-            port=6379,
-            password=os.getenv("REDIS_PASSWORD", ""),
-        )
+        users_cache = users_client()
+
         try:
-            users_cache.ping()
+            cached = users_cache.exists(f"{user_id}_groups")
         except redis.exceptions.ConnectionError:
             logging.error("GROUP-COLLECTION: Could not connect to users-cache.")
             return dash.no_update
@@ -68,10 +96,10 @@ def kick_off_group_collection(url, n_clicks):
         # TODO: check how old groups are. If they're pretty old (threshold tbd) then requery
 
         # check if groups are not already cached, or if the refresh-button was pressed
-        if not users_cache.exists(f"{user_id}_groups") or (dash.ctx.triggered_id == "refresh-button"):
+        if not cached or (dash.ctx.triggered_id == "refresh-button"):
             # kick off celery task to collect groups
             # on query worker queue,
-            return [ugq.apply_async(args=[user_id], queue="data").id]
+            return [ugq.apply_async(args=[user_id], queue=INTERACTIVE_QUEUE).id]
         else:
             return dash.no_update
     else:
@@ -124,20 +152,15 @@ def login_username_button(url):
         if current_user.is_authenticated:
             logging.warning(f"LOGINBUTTON: USER LOGGED IN {current_user}")
             # TODO: implement more permanent interface
-            users_cache = redis.StrictRedis(
-                host=os.getenv("REDIS_SERVICE_USERS_HOST", "redis-users"),
-                port=6379,
-                password=os.getenv("REDIS_PASSWORD", ""),
-            )
+            users_cache = users_client()
+
+            user_id = current_user.get_id()
             try:
-                users_cache.ping()
+                user_info = json.loads(users_cache.get(user_id))
             except redis.exceptions.ConnectionError:
                 logging.error("USERNAME: Could not connect to users-cache.")
                 return dash.no_update
 
-            user_id = current_user.get_id()
-            user_info = json.loads(users_cache.get(user_id))
-
             navlink = [
                 dbc.NavItem(
                     dbc.NavLink(
@@ -184,23 +207,14 @@ def dynamic_multiselect_options(user_in: str, selections):
     if current_user.is_authenticated:
         logging.warning(f"LOGINBUTTON: USER LOGGED IN {current_user}")
         # TODO: implement more permanent interface
-        users_cache = redis.StrictRedis(
-            host=os.getenv("REDIS_SERVICE_USERS_HOST", "redis-users"),
-            port=6379,
-            password=os.getenv("REDIS_PASSWORD", ""),
-            decode_responses=True,
-        )
-        try:
-            users_cache.ping()
-        except redis.exceptions.ConnectionError:
-            logging.error("MULTISELECT: Could not connect to users-cache.")
-            return dash.no_update
+        users_cache = users_client(decode_responses=True)
 
         try:
             if users_cache.exists(f"{current_user.get_id()}_group_options"):
                 options = options + json.loads(users_cache.get(f"{current_user.get_id()}_group_options"))
         except redis.exceptions.ConnectionError:
-            logging.error("Searchbar: couldn't connect to Redis for user group options.")
+            logging.error("MULTISELECT: Could not connect to users-cache.")
+            return dash.no_update
 
     # if the number of options changes then we're
     # adding AUGUR_ entries somewhere.
@@ -253,24 +267,15 @@ def multiselect_values_to_repo_ids(n_clicks, user_vals):
     if current_user.is_authenticated:
         logging.warning(f"LOGINBUTTON: USER LOGGED IN {current_user}")
         # TODO: implement more permanent interface
-        users_cache = redis.StrictRedis(
-            host=os.getenv("REDIS_SERVICE_USERS_HOST", "redis-users"),
-            port=6379,
-            password=os.getenv("REDIS_PASSWORD", ""),
-            decode_responses=True,
-        )
-        try:
-            users_cache.ping()
-        except redis.exceptions.ConnectionError:
-            logging.error("SEARCH-BUTTON: Could not connect to users-cache.")
-            return dash.no_update
+        users_cache = users_client(decode_responses=True)
 
         try:
             if users_cache.exists(f"{current_user.get_id()}_groups"):
                 user_groups = json.loads(users_cache.get(f"{current_user.get_id()}_groups"))
                 logging.warning(f"USERS Groups: {type(user_groups)}, {user_groups}")
         except redis.exceptions.ConnectionError:
-            logging.error("Searchbar: couldn't connect to Redis for user group options.")
+            logging.error("SEARCH-BUTTON: Could not connect to users-cache.")
+            return dash.no_update
 
     group_repos = [user_groups[g] for g in names if not augur.is_org(g)]
     # flatten list repo_ids in orgs to 1D
@@ -281,6 +286,12 @@ def multiselect_values_to_repo_ids(n_clicks, user_vals):
     all_repo_ids = list(set().union(*[repos, org_repos, group_repos]))
     logging.warning(f"SELECTED_REPOS: {all_repo_ids}")
 
+    # the most searched for repos and orgs are kept in the cache.
+    try:
+        cm().count_search(repos=repos, orgs=[o for o in names if augur.is_org(o)])
+    except redis.exceptions.ConnectionError:
+        logging.error("SEARCH-BUTTON: Could not count search towards popularity.")
+
     return "", all_repo_ids
 
 
@@ -339,11 +350,40 @@ def show_help_alert(n_clicks, openness, repo_ids):
     [Output("data-badge", "children"), Output("data-badge", "color")],
     Input("job-ids", "data"),
     background=True,
+    progress=[Output("data-badge", "children")],
 )
-def wait_queries(job_ids):
-    # TODO add docstring to function
+def wait_queries(set_progress, job_ids):
+    """Waits for the query jobs of a selection to finish, showing
+    the share of its results that are cached in the meantime.
 
-    jobs = [AsyncResult(j_id) for j_id in job_ids]
+    Query tasks cache their results a batch of repos at a time,
+    so the share grows while the jobs are running.
+
+    Args:
+        set_progress (function): sets the progress outputs
+        job_ids (dict): jobs, repos shared with other users' jobs and repos being fetched, see 'run_queries'
+
+    Returns:
+        str, str: text and color of the data badge
+    """
+
+    # stores written before other users' fetches were shared are a list of job ids.
+    if isinstance(job_ids, list):
+        job_ids = {"jobs": job_ids, "shared": {}}
+
+    cache = cm()
+
+    # query name -> repos whose results are being fetched
+    pending = {QUERIES_BY_NAME[name]: repos for name, repos in job_ids.get("pending", {}).items()}
+    total = sum(len(repos) for repos in pending.values())
+
+    def report():
+        if not total:
+            return
+        missing = sum(len(cache.missingm([f], repos)[f]) for f, repos in pending.items())
+        set_progress([f"Loading {100 * (total - missing) // total}%"])
+
+    jobs = ResultSet([AsyncResult(j_id) for j_id in job_ids["jobs"]])
 
     # default 'result_expires' for celery config is 86400 seconds.
     # so we don't have to check if the jobs exist. if this tasks
@@ -351,37 +391,33 @@ def wait_queries(job_ids):
     # then we have a big problem. However, we should 'forget' all
     # results before we exit.
 
+    # blocks on the result backend's pub/sub channel until every job
+    # has either failed or succeeded, rather than polling their states.
+    # tasks need to have either failed or succeeded before being forgotten,
+    # otherwise to-be-successful jobs will always be forgotten if one fails.
     while True:
-        logging.warning([j.status for j in jobs])
-
-        # jobs are either all ready
-        if all(j.successful() for j in jobs):
-            logging.warning([j.status for j in jobs])
-            jobs = [j.forget() for j in jobs]
-            return "Data Ready", "#b5b683"
-
-        # or one of them has failed
-        if any(j.failed() for j in jobs):
-            # if a job fails, we need to wait for the others to finish before
-            # we can 'forget' them. otherwise to-be-successful jobs will always
-            # be forgotten if one fails.
-
-            # tasks need to have either failed or succeeded before being forgotten.
-            while True:
-                num_succeeded = [j.successful() for j in jobs].count(True)
-                num_failed = [j.failed() for j in jobs].count(True)
-                num_total = num_failed + num_succeeded
+        try:
+            jobs.join(timeout=PROGRESS_INTERVAL, propagate=False, disable_sync_subtasks=False)
+            break
+        except TimeoutError:
+            report()
+    logging.warning([j.status for j in jobs.results])
 
-                if num_total == len(jobs):
-                    break
+    succeeded = jobs.successful()
+    jobs.forget()
 
-                time.sleep(4.0)
+    # repos whose data another user's job was already fetching.
+    # those jobs are forgotten by whoever started them, so wait
+    # for their data to arrive in the cache instead.
+    if job_ids["shared"]:
+        report()
+    for name, repos in job_ids["shared"].items():
+        succeeded &= cache.wait(func=QUERIES_BY_NAME[name], repos=repos, timeout=None, leased=True)
 
-            jobs = [j.forget() for j in jobs]
-            return "Data Incomplete- Retry", "danger"
+    if succeeded:
+        return "Data Ready", "#b5b683"
 
-        # pause to let something change
-        time.sleep(2.0)
+    return "Data Incomplete- Retry", "danger"
 
 
 @callback(
@@ -394,6 +430,13 @@ def run_queries(repos):
     instance for input Repos; caches results in redis per
     (query_function,repo) pair.
 
+    Large selections are split into chunks of about FANOUT_ROWS
+    estimated rows, balanced by the size of their repos, and each
+    query's chunks are run as a group of tasks on the query workers.
+    Selections of more than INTERACTIVE_ROWS estimated rows or more than
+    INTERACTIVE_REPOS repos are sent to the bulk queue, the rest to the
+    interactive queue.
+
     Args:
         repos ([int]): repositories we collect data for.
     """
@@ -404,17 +447,51 @@ def run_queries(repos):
     # list of queries to process
     funcs = QUERIES
 
+    # only download repos that aren't currently in cache.
+    # the cached repos are about to be read by the visualizations,
+    # mark them as used so they aren't evicted to make room for the others.
+    # repos that were evicted to disk are moved back rather than downloaded again.
+    missing = cache.missingm(funcs, repos, touch=True, promote=True)
+
     # list of job promises
     jobs = []
 
+    # query name -> repos whose data is being fetched by other users' jobs
+    shared = {}
+
+    # query name -> repos whose data is being fetched by any job, for reporting progress
+    pending = {}
+
     for f in funcs:
-        # only download repos that aren't currently in cache
-        not_ready = [r for r in repos if cache.exists(f, r) != 1]
+        if not missing[f]:
+            continue
+
+        pending[f.__name__] = missing[f]
+
+        sizes = augur.repo_sizes(missing[f])
+        n = min(FANOUT_MAX_TASKS, -(-sum(sizes) // FANOUT_ROWS))
+        small = sum(sizes) <= INTERACTIVE_ROWS and len(missing[f]) <= INTERACTIVE_REPOS
+        queue = INTERACTIVE_QUEUE if small else BULK_QUEUE
+
+        tasks = []
+        held = []
+        for chunk in balanced_chunks(missing[f], sizes, n):
+            # only one job fetches any repo's data at a time. take the lease
+            # on the repos no one is fetching yet, and wait on the others.
+            # each chunk's task holds the leases on its own repos.
+            task_id = uuid()
+            not_ready, others = cache.leasem(f, chunk, owner=task_id)
+
+            if not_ready:
+                tasks.append(f.si(not_ready).set(queue=queue, task_id=task_id))
+
+            held += [r for rs in others.values() for r in rs]
 
-        # add job to queue
-        j = f.apply_async(args=[not_ready], queue="data")
+        # add jobs to queue, the data is ready once every chunk is.
+        if tasks:
+            jobs += group(tasks).apply_async().results
 
-        # add job promise to local promise list
-        jobs.append(j)
+        if held:
+            shared[f.__name__] = held
 
-    return [j.id for j in jobs]
+    return {"jobs": [j.id for j in jobs], "shared": shared, "pending": pending}
@@ -11,6 +11,7 @@ from pages.utils.graph_utils import get_graph_time_values, color_seq
 from queries.QUERY_NAME import QUERY_NAME as QUERY_INITIALS
 import io
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.figure_cache import memoize_figure
 from pages.utils.job_utils import nodata_graph
 import time
 
@@ -52,6 +53,9 @@ For more information, check out the new_vis_guidance.md
 PAGE = "page-name"  # EDIT FOR CURRENT PAGE
 VIZ_ID = "shortname-of-viz"  # UNIQUE IDENTIFIER FOR VIZUALIZATION
 
+# columns of the query's results used by this visualization. None decodes all of them.
+COLUMNS = None  # EDIT TO LIST OF COLUMNS USED
+
 gc_VISUALIZATION = dbc.Card(
     [
         dbc.CardBody(
@@ -186,13 +190,14 @@ def toggle_popover(n, is_open):
     ],
     background=True,
 )
+@memoize_figure(f"{PAGE}-{VIZ_ID}", queries=[QUERY_INITIALS])
 def NAME_OF_VISUALIZATION_graph(repolist, interval):
     # wait for data to asynchronously download and become available.
     cache = cm()
-    df = cache.grabm(func=QUERY_INITIALS, repos=repolist)
+    df = cache.grabm(func=QUERY_INITIALS, repos=repolist, columns=COLUMNS)
     while df is None:
-        time.sleep(1.0)
-        df = cache.grabm(func=QUERY_INITIALS, repos=repolist)
+        cache.wait(func=QUERY_INITIALS, repos=repolist)
+        df = cache.grabm(func=QUERY_INITIALS, repos=repolist, columns=COLUMNS)
 
     start = time.perf_counter()
     logging.warning(f"{VIZ_ID}- START")
@@ -2,9 +2,9 @@ import logging
 from db_manager.augur_manager import AugurManager
 from app import celery_app
 import pandas as pd
+import pyarrow as pa
 from cache_manager.cache_manager import CacheManager as cm
-import io
-import datetime as dt
+from queries.query_utils import partition, watermark, compact, DAY, TIMESTAMP, CATEGORY, QueryTask
 from sqlalchemy.exc import SQLAlchemyError
 
 # DEBUGGING
@@ -12,15 +12,35 @@ import os
 
 QUERY_NAME = "COMMITS"
 
+# column that identifies a row, for merging in rows collected since the results were cached.
+ROW_KEY = "commits"
+
+# text columns whose values could be read as another type when extracted with COPY.
+COLUMN_TYPES = {
+    "commits": pa.string(),
+    "author_email": pa.string(),
+    "date": pa.string(),
+}
+
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "author_email": CATEGORY,
+    "date": DAY,
+    # the activity cycle reads the hour of the day from this, it's kept whole.
+    "author_timestamp": TIMESTAMP,
+    "committer_timestamp": TIMESTAMP,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
     retry_jitter=True,
 )
-def commits_query(self, repos):
+def commits_query(self, repos, since=None):
     """
     (Worker Query)
     Executes SQL query against Augur database for commit data.
@@ -28,6 +48,8 @@ def commits_query(self, repos):
     Args:
     -----
         repo_ids ([str]): repos that SQL query is executed on.
+        since (str | None): only query rows collected after this time and merge
+            them into the cached results. Queries all rows if None.
 
     Returns:
     --------
@@ -38,6 +60,9 @@ def commits_query(self, repos):
     if len(repos) == 0:
         return None
 
+    # on a refresh only the rows collected since the results were cached are queried.
+    since_filter = "AND c.data_collection_date > :since" if since else ""
+
     # commenting-outunused query components. only need the repo_id and the
     # authorship date for our current queries. remove the '--' to re-add
     # the now-removed values.
@@ -45,6 +70,7 @@ def commits_query(self, repos):
                     SELECT
                         distinct
                         r.repo_id AS id,
+                        c.data_collection_date AS collected,
                         -- r.repo_name,
                         c.cmt_commit_hash AS commits,
                         -- c.cmt_id AS file,
@@ -60,7 +86,8 @@ def commits_query(self, repos):
                     JOIN commits c
                         ON r.repo_id = c.repo_id
                     WHERE
-                        c.repo_id in ({str(repos)[1:-1]})
+                        c.repo_id = ANY(:repo_ids)
+                        {since_filter}
                     """
 
     try:
@@ -75,33 +102,20 @@ def commits_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
+    # commits are the largest pull, extracted with COPY rather than read_sql.
+    df = dbm.copy_query(query_string, params={"repo_ids": repos, "since": since}, column_types=COLUMN_TYPES).to_pandas()
 
     # change to compatible type and remove all data that has been incorrectly formated
-    df["author_timestamp"] = pd.to_datetime(df["author_timestamp"], utc=True).dt.date
-    df = df[df.author_timestamp < dt.date.today()]
-
-    # break apart returned data per repo
-    # and temporarily store in List to be
-    # stored in Redis.
-    pic = []
-    for r in repos:
-        # convert series to a dataframe
-        # once we've stored the data by ID we no longer need the column.
-        c_df = pd.DataFrame(df.loc[df["id"] == r].drop(columns=["id"])).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
-
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
+    df = compact(df, INGEST_SCHEMA)
+    df = df[df.author_timestamp < pd.Timestamp.now(tz="UTC").normalize()]
 
-        # move head of buffer to the beginning
-        b.seek(0)
+    # split the results per repo in one pass, the slices are serialized
+    # by the cache manager. once we've stored the data by ID we no longer need the column.
+    pic = partition(df, repos, drop_key=True)
 
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+    # the watermark is kept alongside the results rather than as a column.
+    marks = [watermark(t.column("collected")) for t in pic]
+    pic = [t.remove_column(t.schema.get_field_index("collected")) for t in pic]
 
     del df
 
@@ -109,11 +123,21 @@ def commits_query(self, repos):
     cm_o = cm()
 
     # 'ack' is a boolean of whether data was set correctly or not.
-    ack = cm_o.setm(
-        func=commits_query,
-        repos=repos,
-        datas=pic,
-    )
+    if since is None:
+        ack = cm_o.setm(
+            func=commits_query,
+            repos=repos,
+            datas=pic,
+            watermarks=marks,
+        )
+    else:
+        ack = cm_o.mergem(
+            func=commits_query,
+            repos=repos,
+            datas=pic,
+            key=ROW_KEY,
+            watermarks=marks,
+        )
 
     logging.warning(f"{QUERY_NAME}_DATA_QUERY - END")
     return ack
@@ -3,15 +3,25 @@ from db_manager.augur_manager import AugurManager
 from app import celery_app
 import pandas as pd
 from cache_manager.cache_manager import CacheManager as cm
-import io
-import datetime as dt
+from queries.query_utils import partition, compact, DAY, CATEGORY, QueryTask
 from sqlalchemy.exc import SQLAlchemyError
 
 QUERY_NAME = "COMPANY"
 
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "cntrb_id": CATEGORY,
+    "created": DAY,
+    "login": CATEGORY,
+    "action": CATEGORY,
+    "cntrb_company": CATEGORY,
+    "email_list": CATEGORY,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
@@ -40,7 +50,7 @@ def company_query(self, repos):
     if len(repos) == 0:
         return None
 
-    query_string = f"""
+    query_string = """
                     SELECT
                         c.cntrb_id,
                         c.created_at AS created,
@@ -57,7 +67,7 @@ def company_query(self, repos):
                     JOIN contributors con
                         ON c.cntrb_id = con.cntrb_id
                     WHERE
-                        c.repo_id in({str(repos)[1:-1]})
+                        c.repo_id = ANY(:repo_ids)
                     GROUP BY c.cntrb_id, c.created_at, c.repo_id, c.login, c.action, c.rank, con.cntrb_company
                     """
 
@@ -73,7 +83,7 @@ def company_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
+    df = dbm.run_query(query_string, params={"repo_ids": repos})
 
     # reformat cntrb_id
     df["cntrb_id"] = df["cntrb_id"].astype(str)
@@ -82,33 +92,15 @@ def company_query(self, repos):
     df = df.sort_values(by="created")
 
     # change to compatible type and remove all data that has been incorrectly formatted
-    df["created"] = pd.to_datetime(df["created"], utc=True).dt.date
-    df = df[df.created < dt.date.today()]
+    df = compact(df, INGEST_SCHEMA)
+    df = df[df.created < pd.Timestamp.now(tz="UTC").normalize()]
 
     df = df.reset_index()
     df.drop("index", axis=1, inplace=True)
 
-    # break apart returned data per repo
-    # and temporarily store in List to be
-    # stored in Redis.
-    pic = []
-    for r in repos:
-        # convert series to a dataframe
-        # once we've stored the data by ID we no longer need the column.
-        c_df = pd.DataFrame(df.loc[df["id"] == r].drop(columns=["id"])).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
-
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
-
-        # move head of buffer to the beginning
-        b.seek(0)
-
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+    # split the results per repo in one pass, the slices are serialized
+    # by the cache manager. once we've stored the data by ID we no longer need the column.
+    pic = partition(df, repos, drop_key=True)
 
     del df
 
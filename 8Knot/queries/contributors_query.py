@@ -3,15 +3,40 @@ import pandas as pd
 from db_manager.augur_manager import AugurManager
 from app import celery_app
 from cache_manager.cache_manager import CacheManager as cm
-import io
-import datetime as dt
+from queries.query_utils import split_batches, compact, DAY, CATEGORY, QueryTask
 from sqlalchemy.exc import SQLAlchemyError
 
 QUERY_NAME = "CONTRIBUTOR"
 
+# names of the actions, as shown in the visualizations.
+ACTIONS = {
+    "pull_request_open": "PR Opened",
+    "pull_request_comment": "PR Comment",
+    "pull_request_closed": "PR Closed",
+    "pull_request_merged": "PR Merged",
+    "pull_request_review_COMMENTED": "PR Review",
+    "pull_request_review_APPROVED": "PR Review",
+    "pull_request_review_CHANGES_REQUESTED": "PR Review",
+    "pull_request_review_DISMISSED": "PR Review",
+    "issue_opened": "Issue Opened",
+    "issue_closed": "Issue Closed",
+    "issue_comment": "Issue Comment",
+    "commit": "Commit",
+}
+
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "repo_name": CATEGORY,
+    "cntrb_id": CATEGORY,
+    "created_at": DAY,
+    "login": CATEGORY,
+    "Action": CATEGORY,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
@@ -40,7 +65,7 @@ def contributors_query(self, repos):
     if len(repos) == 0:
         return None
 
-    query_string = f"""
+    query_string = """
                     SELECT
                         repo_id as id,
                         repo_name as repo_name,
@@ -52,7 +77,7 @@ def contributors_query(self, repos):
                     FROM
                         augur_data.explorer_contributor_actions
                     WHERE
-                        repo_id in ({str(repos)[1:-1]})
+                        repo_id = ANY(:repo_ids)
                 """
 
     try:
@@ -67,53 +92,30 @@ def contributors_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
-
-    # update column values
-    df.loc[df["action"] == "pull_request_open", "action"] = "PR Opened"
-    df.loc[df["action"] == "pull_request_comment", "action"] = "PR Comment"
-    df.loc[df["action"] == "pull_request_closed", "action"] = "PR Closed"
-    df.loc[df["action"] == "pull_request_merged", "action"] = "PR Merged"
-    df.loc[df["action"] == "pull_request_review_COMMENTED", "action"] = "PR Review"
-    df.loc[df["action"] == "pull_request_review_APPROVED", "action"] = "PR Review"
-    df.loc[df["action"] == "pull_request_review_CHANGES_REQUESTED", "action"] = "PR Review"
-    df.loc[df["action"] == "pull_request_review_DISMISSED", "action"] = "PR Review"
-    df.loc[df["action"] == "issue_opened", "action"] = "Issue Opened"
-    df.loc[df["action"] == "issue_closed", "action"] = "Issue Closed"
-    df.loc[df["action"] == "issue_comment", "action"] = "Issue Comment"
-    df.loc[df["action"] == "commit", "action"] = "Commit"
-    df.rename(columns={"action": "Action"}, inplace=True)
-
-    # reformat cntrb_id
-    df["cntrb_id"] = df["cntrb_id"].astype(str)
-    df["cntrb_id"] = df["cntrb_id"].str[:15]
-
-    # change to compatible type and remove all data that has been incorrectly formated
-    df["created_at"] = pd.to_datetime(df["created_at"], utc=True).dt.date
-    df = df[df.created_at < dt.date.today()]
-
-    df = df.reset_index(drop=True)
+    # results are streamed from the database and split per repo as they arrive,
+    # so the whole result is never held as one frame.
+    tables = split_batches(dbm.stream_query(query_string, params={"repo_ids": repos}), repos)
 
     pic = []
 
     for i, r in enumerate(repos):
-        # convert series to a dataframe
-        c_df = pd.DataFrame(df.loc[df["id"] == r]).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
+        c_df = tables[i].to_pandas()
+        tables[i] = None
 
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
+        # update column values
+        c_df["action"] = c_df["action"].replace(ACTIONS)
+        c_df.rename(columns={"action": "Action"}, inplace=True)
 
-        # move head of buffer to the beginning
-        b.seek(0)
+        # reformat cntrb_id
+        c_df["cntrb_id"] = c_df["cntrb_id"].astype(str)
+        c_df["cntrb_id"] = c_df["cntrb_id"].str[:15]
 
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+        # change to compatible type and remove all data that has been incorrectly formated
+        c_df = compact(c_df, INGEST_SCHEMA)
+        c_df = c_df[c_df.created_at < pd.Timestamp.now(tz="UTC").normalize()]
 
-    del df
+        # frames are serialized by the cache manager
+        pic.append(c_df.reset_index(drop=True))
 
     # store results in Redis
     cm_o = cm()
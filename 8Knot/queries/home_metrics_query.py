@@ -0,0 +1,171 @@
+import logging
+from db_manager.augur_manager import AugurManager
+from app import celery_app
+from cache_manager.cache_manager import CacheManager as cm
+from queries.query_utils import partition, QueryTask
+from sqlalchemy.exc import SQLAlchemyError
+
+QUERY_NAME = "HOME_METRICS"
+
+# the cards summarize the current state of the repos, so they're
+# re-queried more often than the other results.
+CACHE_TTL = 60 * 60 * 6
+
+
+@celery_app.task(
+    bind=True,
+    base=QueryTask,
+    autoretry_for=(Exception,),
+    exponential_backoff=2,
+    retry_kwargs={"max_retries": 5},
+    retry_jitter=True,
+)
+def home_metrics_query(self, repos):
+    """
+    (Worker Query)
+    Executes SQL query against Augur database for the metrics on the home page cards.
+
+    Each repo's results are one row of sums and counts rather than averages,
+    so that the metrics of a selection are aggregated from the cached rows of
+    its repos. Ages are stored as sums of epoch seconds and are measured
+    against the current time when they're read.
+
+    Args:
+    -----
+        repo_ids ([str]): repos that SQL query is executed on.
+
+    Returns:
+    --------
+        dict: Results from SQL query, interpreted from pd.to_dict('records')
+    """
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - START")
+
+    if len(repos) == 0:
+        return None
+
+    query_string = """
+                    WITH
+                    /*
+                    * For each commit, the number of files and lines it changed.
+                    * */
+                    commit_delta AS (
+                        SELECT
+                            c.repo_id,
+                            count(*) AS files,
+                            sum(c.cmt_added) AS lines_added,
+                            sum(c.cmt_removed) AS lines_removed
+                        FROM augur_data.commits c
+                        WHERE c.repo_id = ANY(:repo_ids)
+                        GROUP BY c.repo_id, c.cmt_commit_hash
+                    ),
+                    commit_metrics AS (
+                        SELECT
+                            repo_id,
+                            count(*) AS commits,
+                            sum(files) AS commit_files,
+                            sum(lines_added) AS lines_added,
+                            sum(lines_removed) AS lines_removed
+                        FROM commit_delta
+                        GROUP BY repo_id
+                    ),
+                    pr_metrics AS (
+                        SELECT
+                            pr.repo_id,
+                            count(*) FILTER (WHERE pr.pr_closed_at IS NULL) AS open_prs,
+                            sum(extract(epoch FROM pr.pr_created_at)) FILTER (WHERE pr.pr_closed_at IS NULL) AS open_pr_created,
+                            count(*) FILTER (WHERE pr.pr_merged_at IS NOT NULL) AS merged_prs,
+                            count(*) FILTER (WHERE pr.pr_merged_at IS NULL AND pr.pr_closed_at IS NOT NULL) AS rejected_prs,
+                            count(*) FILTER (WHERE pr.pr_merged_at IS NOT NULL AND pr.pr_closed_at IS NOT NULL) AS closed_merged_prs,
+                            sum(extract(epoch FROM pr.pr_merged_at - pr.pr_created_at))
+                                FILTER (WHERE pr.pr_merged_at IS NOT NULL AND pr.pr_closed_at IS NOT NULL) AS merged_pr_age
+                        FROM augur_data.pull_requests pr
+                        WHERE pr.repo_id = ANY(:repo_ids)
+                        GROUP BY pr.repo_id
+                    ),
+                    /*
+                    * count the number of unique message ID's for each PR that has messages
+                    * */
+                    pr_message_metrics AS (
+                        SELECT
+                            pr.repo_id,
+                            count(DISTINCT pr.pull_request_id) AS messaged_prs,
+                            count(DISTINCT prmr.msg_id) AS pr_messages
+                        FROM
+                            augur_data.pull_requests pr,
+                            augur_data.pull_request_message_ref prmr
+                        WHERE
+                            pr.repo_id = ANY(:repo_ids)
+                            AND prmr.pull_request_id = pr.pull_request_id
+                        GROUP BY pr.repo_id
+                    ),
+                    issue_metrics AS (
+                        SELECT
+                            i.repo_id,
+                            count(*) FILTER (WHERE i.closed_at IS NULL) AS open_issues,
+                            sum(extract(epoch FROM i.created_at)) FILTER (WHERE i.closed_at IS NULL) AS open_issue_created,
+                            count(*) FILTER (WHERE i.closed_at IS NOT NULL) AS closed_issues,
+                            sum(extract(epoch FROM i.created_at)) FILTER (WHERE i.closed_at IS NOT NULL) AS closed_issue_created
+                        FROM augur_data.issues i
+                        WHERE i.repo_id = ANY(:repo_ids)
+                        GROUP BY i.repo_id
+                    )
+                    SELECT
+                        r.repo_id AS id,
+                        coalesce(cm.commits, 0) AS commits,
+                        coalesce(cm.commit_files, 0) AS commit_files,
+                        coalesce(cm.lines_added, 0) AS lines_added,
+                        coalesce(cm.lines_removed, 0) AS lines_removed,
+                        coalesce(pm.open_prs, 0) AS open_prs,
+                        coalesce(pm.open_pr_created, 0)::float8 AS open_pr_created,
+                        coalesce(pm.merged_prs, 0) AS merged_prs,
+                        coalesce(pm.rejected_prs, 0) AS rejected_prs,
+                        coalesce(pm.closed_merged_prs, 0) AS closed_merged_prs,
+                        coalesce(pm.merged_pr_age, 0)::float8 AS merged_pr_age,
+                        coalesce(pmm.messaged_prs, 0) AS messaged_prs,
+                        coalesce(pmm.pr_messages, 0) AS pr_messages,
+                        coalesce(im.open_issues, 0) AS open_issues,
+                        coalesce(im.open_issue_created, 0)::float8 AS open_issue_created,
+                        coalesce(im.closed_issues, 0) AS closed_issues,
+                        coalesce(im.closed_issue_created, 0)::float8 AS closed_issue_created
+                    FROM
+                        augur_data.repo r
+                        LEFT JOIN commit_metrics cm ON cm.repo_id = r.repo_id
+                        LEFT JOIN pr_metrics pm ON pm.repo_id = r.repo_id
+                        LEFT JOIN pr_message_metrics pmm ON pmm.repo_id = r.repo_id
+                        LEFT JOIN issue_metrics im ON im.repo_id = r.repo_id
+                    WHERE
+                        r.repo_id = ANY(:repo_ids)
+                    """
+
+    try:
+        dbm = AugurManager()
+        dbm.get_engine()
+    except KeyError:
+        # noack, data wasn't successfully set.
+        logging.error(f"{QUERY_NAME}_DATA_QUERY - INCOMPLETE ENVIRONMENT")
+        return False
+    except SQLAlchemyError:
+        logging.error(f"{QUERY_NAME}_DATA_QUERY - COULDN'T CONNECT TO DB")
+        # allow retry via Celery rules.
+        raise SQLAlchemyError("DBConnect failed")
+
+    df = dbm.run_query(query_string, params={"repo_ids": repos})
+
+    # split the results per repo in one pass, the slices
+    # are serialized by the cache manager.
+    pic = partition(df, repos)
+
+    del df
+
+    # store results in Redis
+    cm_o = cm()
+
+    # 'ack' is a boolean of whether data was set correctly or not.
+    ack = cm_o.setm(
+        func=home_metrics_query,
+        repos=repos,
+        datas=pic,
+    )
+
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - END")
+    return ack
@@ -3,15 +3,24 @@ import pandas as pd
 from db_manager.augur_manager import AugurManager
 from app import celery_app
 from cache_manager.cache_manager import CacheManager as cm
-import io
-import datetime as dt
+from queries.query_utils import partition, compact, DAY, TIMESTAMP, CATEGORY, QueryTask
 from sqlalchemy.exc import SQLAlchemyError
 
 QUERY_NAME = "ISSUE_ASSIGNEE"
 
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "assignee": CATEGORY,
+    "assignment_action": CATEGORY,
+    "created": DAY,
+    "closed": TIMESTAMP,
+    "assign_date": TIMESTAMP,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
@@ -38,13 +47,13 @@ def issue_assignee_query(self, repos):
     if len(repos) == 0:
         return None
 
-    query_string = f"""
+    query_string = """
                     SELECT
                         *
                     FROM
                         explorer_issue_assignments ia
                     WHERE
-                        ia.id in ({str(repos)[1:-1]})
+                        ia.id = ANY(:repo_ids)
                 """
 
     try:
@@ -59,34 +68,19 @@ def issue_assignee_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
+    df = dbm.run_query(query_string, params={"repo_ids": repos})
 
     # id as string and slice to remove excess 0s
     df["assignee"] = df["assignee"].astype(str)
     df["assignee"] = df["assignee"].str[:15]
 
     # change to compatible type and remove all data that has been incorrectly formated
-    df["created"] = pd.to_datetime(df["created"], utc=True).dt.date
-    df = df[df.created < dt.date.today()]
-
-    pic = []
-
-    for i, r in enumerate(repos):
-        # convert series to a dataframe
-        c_df = pd.DataFrame(df.loc[df["id"] == r]).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
-
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
-
-        # move head of buffer to the beginning
-        b.seek(0)
+    df = compact(df, INGEST_SCHEMA)
+    df = df[df.created < pd.Timestamp.now(tz="UTC").normalize()]
 
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+    # split the results per repo in one pass, the slices
+    # are serialized by the cache manager.
+    pic = partition(df, repos)
 
     del df
 
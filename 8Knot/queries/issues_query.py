@@ -2,22 +2,32 @@ import logging
 from db_manager.augur_manager import AugurManager
 from app import celery_app
 from cache_manager.cache_manager import CacheManager as cm
+from queries.query_utils import partition, watermark, compact, DAY, TIMESTAMP, CATEGORY, QueryTask
 import pandas as pd
-import io
-import datetime as dt
 from sqlalchemy.exc import SQLAlchemyError
 
 QUERY_NAME = "ISSUE"
 
+# column that identifies a row, for merging in rows collected since the results were cached.
+ROW_KEY = "issue"
+
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "repo_name": CATEGORY,
+    "created": DAY,
+    "closed": TIMESTAMP,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
     retry_jitter=True,
 )
-def issues_query(self, repos):
+def issues_query(self, repos, since=None):
     """
     (Worker Query)
     Executes SQL query against Augur database for issue data.
@@ -25,6 +35,8 @@ def issues_query(self, repos):
     Args:
     -----
         repo_ids ([str]): repos that SQL query is executed on.
+        since (str | None): only query rows collected after this time and merge
+            them into the cached results. Queries all rows if None.
 
     Returns:
     --------
@@ -36,9 +48,13 @@ def issues_query(self, repos):
     if len(repos) == 0:
         return None
 
+    # on a refresh only the rows collected since the results were cached are queried.
+    since_filter = "AND i.data_collection_date > :since" if since else ""
+
     query_string = f"""
                     SELECT
                         r.repo_id as id,
+                        i.data_collection_date AS collected,
                         r.repo_name,
                         i.issue_id AS issue,
                         i.gh_issue_number AS issue_number,
@@ -51,7 +67,8 @@ def issues_query(self, repos):
                         issues i
                     WHERE
                         r.repo_id = i.repo_id AND
-                        r.repo_id in ({str(repos)[1:-1]})
+                        r.repo_id = ANY(:repo_ids)
+                        {since_filter}
                     """
 
     try:
@@ -66,39 +83,26 @@ def issues_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
+    df = dbm.run_query(query_string, params={"repo_ids": repos, "since": since})
 
     df = df[df["pull_request_id"].isnull()]
     df = df.drop(columns="pull_request_id")
     df = df.sort_values(by="created")
 
     # change to compatible type and remove all data that has been incorrectly formated
-    df["created"] = pd.to_datetime(df["created"], utc=True).dt.date
-    df = df[df.created < dt.date.today()]
+    df = compact(df, INGEST_SCHEMA)
+    df = df[df.created < pd.Timestamp.now(tz="UTC").normalize()]
 
     df = df.reset_index()
     df.drop("index", axis=1, inplace=True)
 
-    # break apart returned data per repo
-    # and temporarily store in List to be
-    # stored in Redis.
-    pic = []
-    for i, r in enumerate(repos):
-        # convert series to a dataframe
-        c_df = pd.DataFrame(df.loc[df["id"] == r]).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
-
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
-
-        # move head of buffer to the beginning
-        b.seek(0)
+    # split the results per repo in one pass, the slices are serialized
+    # by the cache manager.
+    pic = partition(df, repos)
 
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+    # the watermark is kept alongside the results rather than as a column.
+    marks = [watermark(t.column("collected")) for t in pic]
+    pic = [t.remove_column(t.schema.get_field_index("collected")) for t in pic]
 
     del df
 
@@ -106,11 +110,22 @@ def issues_query(self, repos):
     cm_o = cm()
 
     # 'ack' is a boolean of whether data was set correctly or not.
-    ack = cm_o.setm(
-        func=issues_query,
-        repos=repos,
-        datas=pic,
-    )
+    if since is None:
+        ack = cm_o.setm(
+            func=issues_query,
+            repos=repos,
+            datas=pic,
+            watermarks=marks,
+        )
+    else:
+        ack = cm_o.mergem(
+            func=issues_query,
+            repos=repos,
+            datas=pic,
+            key=ROW_KEY,
+            watermarks=marks,
+            sort_by="created",
+        )
 
     logging.warning(f"{QUERY_NAME}_DATA_QUERY - END")
     return ack
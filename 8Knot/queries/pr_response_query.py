@@ -3,15 +3,24 @@ import pandas as pd
 from db_manager.augur_manager import AugurManager
 from app import celery_app
 from cache_manager.cache_manager import CacheManager as cm
-import io
-import datetime as dt
+from queries.query_utils import partition, compact, DAY, TIMESTAMP, CATEGORY, QueryTask
 from sqlalchemy.exc import SQLAlchemyError
 
 QUERY_NAME = "PR_RESPONSE"
 
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "cntrb_id": CATEGORY,
+    "msg_cntrb_id": CATEGORY,
+    "pr_created_at": DAY,
+    "pr_closed_at": TIMESTAMP,
+    "msg_timestamp": TIMESTAMP,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
@@ -39,7 +48,7 @@ def pr_response_query(self, repos):
     if len(repos) == 0:
         return None
 
-    query_string = f"""
+    query_string = """
                     SELECT
                         pr.pull_request_id,
                         pr.repo_id AS ID,
@@ -81,7 +90,7 @@ def pr_response_query(self, repos):
                         ON
                             M.pull_request_id = pr.pull_request_id
                     WHERE
-                        pr.repo_id in ({str(repos)[1:-1]})
+                        pr.repo_id = ANY(:repo_ids)
                 """
 
     try:
@@ -96,7 +105,7 @@ def pr_response_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
+    df = dbm.run_query(query_string, params={"repo_ids": repos})
 
     # reformat cntrb_id
     df["cntrb_id"] = df["cntrb_id"].astype(str)
@@ -106,27 +115,12 @@ def pr_response_query(self, repos):
     df["msg_cntrb_id"] = df["msg_cntrb_id"].str[:15]
 
     # change to compatible type and remove all data that has been incorrectly formated
-    df["pr_created_at"] = pd.to_datetime(df["pr_created_at"], utc=True).dt.date
-    df = df[df.pr_created_at < dt.date.today()]
-
-    pic = []
-
-    for i, r in enumerate(repos):
-        # convert series to a dataframe
-        c_df = pd.DataFrame(df.loc[df["id"] == r]).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
-
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
-
-        # move head of buffer to the beginning
-        b.seek(0)
+    df = compact(df, INGEST_SCHEMA)
+    df = df[df.pr_created_at < pd.Timestamp.now(tz="UTC").normalize()]
 
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+    # split the results per repo in one pass, the slices
+    # are serialized by the cache manager.
+    pic = partition(df, repos)
 
     del df
 
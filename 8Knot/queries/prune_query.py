@@ -0,0 +1,36 @@
+import logging
+from app import celery_app
+from cache_manager.cache_manager import CacheManager as cm
+
+QUERY_NAME = "PRUNE"
+
+
+@celery_app.task(
+    bind=True,
+)
+def prune_query(self):
+    """
+    (Worker Query)
+    Removes cached results and figures that expired from the cache's
+    eviction bookkeeping, and decays the access counts that LFU
+    eviction orders entries by.
+
+    Keeps the bookkeeping from growing with every entry that was ever
+    cached when there's no memory budget, and keeps the sizes of expired
+    entries from counting towards the budget when there is one.
+
+    Returns:
+    --------
+        int: number of expired entries removed
+    """
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - START")
+
+    cache = cm()
+
+    pruned = cache.prune()
+
+    # use since the last prune counts the most.
+    cache.decay_access_counts()
+
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - END")
+    return pruned
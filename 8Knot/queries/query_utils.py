@@ -0,0 +1,249 @@
+"""
+    Helpers shared by the query tasks. Not tasks themselves.
+"""
+import os
+import heapq
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from celery import Task
+from cache_manager.cache_manager import CacheManager as cm
+
+# repos a query task fetches and caches at a time. a task that fails part
+# way through is retried only for the repos it hadn't cached yet.
+CHECKPOINT_REPOS = int(os.getenv("QUERY_CHECKPOINT_REPOS", "100"))
+
+# kinds of the columns of a query's ingestion schema, see 'compact'.
+# UTC timestamp truncated to the day. Only for columns that are read by their date.
+DAY = "day"
+# UTC timestamp.
+TIMESTAMP = "timestamp"
+# dictionary-encoded value, for ids and names that repeat across rows.
+CATEGORY = "category"
+
+
+class QueryTask(Task):
+    """
+    Base of the query tasks that fetch and cache results for a list of repos.
+
+    The repos are fetched in batches of CHECKPOINT_REPOS, each cached as soon
+    as it's fetched, so the repos done before a failure aren't lost with it.
+    A retry is sent with the task's original repos, of which only the ones
+    that still aren't cached are fetched again. Refreshes ('since') merge
+    into results that are already cached, so all of their repos are fetched.
+    """
+
+    def __call__(self, repos, *args, **kwargs):
+        if self.request.retries and kwargs.get("since") is None:
+            cached = len(repos)
+            repos = cm().missingm([self], repos)[self]
+            cached -= len(repos)
+            if cached:
+                logging.warning(f"{self.name} - RETRY, {cached} REPOS ALREADY CACHED")
+
+        # 'run' is wrapped by autoretry, a failing batch retries the whole task.
+        batches = [repos[i : i + CHECKPOINT_REPOS] for i in range(0, len(repos), CHECKPOINT_REPOS)]
+        if len(batches) <= 1:
+            return self.run(repos, *args, **kwargs)
+
+        return all([self.run(batch, *args, **kwargs) for batch in batches])
+
+
+def compact(df, schema):
+    """Converts the columns of a query's results to the types of its ingestion schema.
+
+    Timestamps are stored as int64 UTC rather than as Python dates, so reading
+    them with pd.to_datetime(..., utc=True) doesn't convert them again. Ids and
+    names are dictionary-encoded, each row only holds a small integer code.
+
+    Args:
+        df (pd.DataFrame): results of a query
+        schema (dict{str: str}): kind of each column that is converted, DAY, TIMESTAMP or CATEGORY
+
+    Returns:
+        pd.DataFrame: the results, converted in place.
+    """
+    for col, kind in schema.items():
+        if kind == CATEGORY:
+            df[col] = df[col].astype("category")
+        elif kind == DAY:
+            df[col] = pd.to_datetime(df[col], utc=True).dt.normalize()
+        elif kind == TIMESTAMP:
+            df[col] = pd.to_datetime(df[col], utc=True)
+        else:
+            raise ValueError(f"unknown column kind {kind} of {col}")
+
+    return df
+
+
+def watermark(collected):
+    """High-water mark of a repo's results: the time up to which
+    rows collected into the database are in the results.
+
+    Rows from today are filtered out by the queries, so the mark never
+    goes past yesterday; rows collected since are fetched again on the next
+    refresh and replace the cached copies of those rows.
+
+    Args:
+        collected (pd.Series | pa.ChunkedArray): time each of the repo's rows was collected by Augur
+
+    Returns:
+        str: ISO-8601 timestamp
+    """
+    cap = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=1)
+
+    if isinstance(collected, pa.ChunkedArray):
+        collected = collected.to_pandas()
+
+    mark = pd.to_datetime(collected, utc=True).max()
+    if pd.isnull(mark) or mark > cap:
+        mark = cap
+    return mark.isoformat()
+
+
+def partition(data, repos, key="id", drop_key=False):
+    """Splits the results of a query into the results of each repo, in one pass.
+
+    The results are sorted by repo once, keeping the order of each repo's rows,
+    and cut into zero-copy slices at the boundaries between repos. The slices
+    are Arrow Tables, which the cache manager serializes without converting them.
+
+    Args:
+        data (pd.DataFrame | pa.Table): results of a query for all repos
+        repos (list[int]): repos the query was run on
+        key (str): column holding the repo of each row
+        drop_key (bool): leave the key column out of the slices
+
+    Returns:
+        list[pa.Table]: results of each repo, in the order of repos.
+    """
+    if isinstance(data, pd.DataFrame):
+        data = pa.Table.from_pandas(data, preserve_index=False)
+
+    ids = data.column(key).to_numpy()
+    if drop_key:
+        data = data.remove_column(data.schema.get_field_index(key))
+
+    order = np.argsort(ids, kind="stable")
+    if (order != np.arange(len(order))).any():
+        data = data.take(pa.array(order))
+        ids = ids[order]
+
+    # one contiguous chunk, so that each slice is a single chunk too.
+    data = data.combine_chunks()
+
+    slices = {}
+    for r, start, end in _runs(ids):
+        slices[r] = data.slice(start, end - start)
+
+    empty = data.slice(0, 0)
+    return [slices.get(r, empty) for r in repos]
+
+
+def _runs(ids):
+    """
+    (private)
+    Boundaries of the runs of equal values of sorted ids.
+
+    Yields:
+        (int, int, int): id, start and end of each run
+    """
+    if len(ids) == 0:
+        return
+
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], len(ids)]
+    for start, end in zip(starts, ends):
+        yield int(ids[start]), int(start), int(end)
+
+
+def split_batches(batches, repos, key="id"):
+    """Splits query results into the results of each repo as they arrive.
+
+    Each batch is sorted by repo once and cut into zero-copy slices
+    at the boundaries between repos, so no batch is scanned once per repo.
+
+    Args:
+        batches (Iterable[pa.RecordBatch]): results of a query, e.g. from AugurManager.stream_query
+        repos (list[int]): repos the query was run on
+        key (str): column holding the repo of each row
+
+    Returns:
+        list[pa.Table]: results of each repo, in the order of repos.
+    """
+    parts = {r: [] for r in repos}
+    schema = None
+
+    for b in batches:
+        if schema is None:
+            schema = b.schema
+        if b.num_rows == 0:
+            continue
+
+        ids = b.column(b.schema.get_field_index(key)).to_numpy(zero_copy_only=False)
+        order = np.argsort(ids, kind="stable")
+        b = b.take(pa.array(order))
+        ids = ids[order]
+
+        for r, start, end in _runs(ids):
+            if r in parts:
+                parts[r].append(b.slice(start, end - start))
+
+    return [_assemble(parts[r], schema) for r in repos]
+
+
+def _assemble(slices, schema):
+    """
+    (private)
+    Assembles the slices of one repo's results into a table.
+    Column types may differ between slices if a column was all null
+    in the first batches of the results.
+    """
+    if not slices:
+        return schema.empty_table()
+
+    try:
+        return pa.Table.from_batches(slices)
+    except pa.ArrowInvalid:
+        pass
+
+    tables = [pa.Table.from_batches([s]) for s in slices]
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except TypeError:
+        # pyarrow < 14
+        return pa.concat_tables(tables, promote=True)
+
+
+def balanced_chunks(repos, sizes, n):
+    """Splits repos into n chunks of about the same total size.
+
+    Repos are placed largest first, each into the chunk that is
+    smallest so far, so a few very large repos each get a chunk of
+    their own while the small ones fill up the rest.
+
+    Args:
+        repos (list[int]): repos to split
+        sizes (list[int]): estimated size of each repo
+        n (int): number of chunks
+
+    Returns:
+        list[list[int]]: non-empty chunks, largest first, each in the order of repos.
+    """
+    n = max(1, min(n, len(repos)))
+
+    # (total size, chunk index) of each chunk.
+    heap = [(0, i) for i in range(n)]
+    chunks = [[] for _ in range(n)]
+    totals = [0] * n
+
+    order = sorted(range(len(repos)), key=lambda i: sizes[i], reverse=True)
+    for i in order:
+        total, c = heapq.heappop(heap)
+        chunks[c].append(i)
+        totals[c] = total + sizes[i]
+        heapq.heappush(heap, (totals[c], c))
+
+    ranked = sorted(range(n), key=lambda c: totals[c], reverse=True)
+    return [[repos[i] for i in sorted(chunks[c])] for c in ranked if chunks[c]]
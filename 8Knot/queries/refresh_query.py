@@ -0,0 +1,65 @@
+import logging
+import os
+from celery.utils import uuid
+from app import celery_app
+from _celery import BULK_QUEUE
+from cache_manager.cache_manager import CacheManager as cm
+from queries.issues_query import issues_query as iq
+from queries.prs_query import prs_query as prq
+from queries.commits_query import commits_query as cq
+
+QUERY_NAME = "REFRESH"
+
+# queries whose cached results can be refreshed with only the rows collected since.
+REFRESHABLE = [iq, prq, cq]
+
+# number of repos refreshed by one query task.
+REFRESH_BATCH = int(os.getenv("CACHE_REFRESH_BATCH", "100"))
+
+
+@celery_app.task(
+    bind=True,
+)
+def refresh_query(self):
+    """
+    (Worker Query)
+    Refreshes the cached results of every refreshable query.
+
+    For each cached repo, only the rows collected since its results'
+    high-water mark are queried and merged into the cached results.
+    Repos are batched by watermark so that each query task's 'since'
+    is close to the watermarks of all of its repos. Repos that another
+    task is already fetching are skipped.
+
+    Returns:
+    --------
+        int: number of query tasks started
+    """
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - START")
+
+    cache = cm()
+
+    started = 0
+    for f in REFRESHABLE:
+        marks = cache.watermarks(f)
+        repos = sorted(marks, key=marks.get)
+
+        for i in range(0, len(repos), REFRESH_BATCH):
+            batch = repos[i : i + REFRESH_BATCH]
+
+            # the lease is released when the query task finishes.
+            task_id = uuid()
+            leased, _ = cache.leasem(f, batch, owner=task_id)
+            if not leased:
+                continue
+
+            f.apply_async(
+                args=[leased],
+                kwargs={"since": min(marks[r] for r in leased)},
+                queue=BULK_QUEUE,
+                task_id=task_id,
+            )
+            started += 1
+
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - END")
+    return started
@@ -1,9 +1,8 @@
 import logging
-import pandas as pd
 from db_manager.augur_manager import AugurManager
 from app import celery_app
 from cache_manager.cache_manager import CacheManager as cm
-import io
+from queries.query_utils import partition, compact, DAY, QueryTask
 import datetime as dt
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -21,9 +20,15 @@ TODO:
 
 QUERY_NAME = "release_frequencey"
 
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "created": DAY,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
@@ -47,17 +52,17 @@ def release_frequencey_query(self, repos):
     if len(repos) == 0:
         return None
 
-    query_string = f"""
+    query_string = """
                 SELECT DATE_TRUNC('month', release_created_at)::date AS created,
                 COUNT(*) AS total_releases, repo_id as id
                 FROM augur_data.releases
                 WHERE release_is_draft = false
                 AND
-                repo_id in ({str(repos)[1:-1]})
+                repo_id = ANY(:repo_ids)
                 GROUP BY created,id
                 LIMIT 20;
                     """
-                    # repo_id in ({str(repos)[1:-1]})
+                    # repo_id = ANY(:repo_ids)
 
     try:
         dbm = AugurManager()
@@ -71,7 +76,7 @@ def release_frequencey_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
+    df = dbm.run_query(query_string, params={"repo_ids": repos})
 
     # pandas column and format updates
     #Commonly used df updates:
@@ -85,25 +90,11 @@ def release_frequencey_query(self, repos):
     # change to compatible type and remove all data that has been incorrectly formated
     #df["created_month"] = pd.to_datetime(df["created_month"], utc=True).dt.date
     #df = df[df.created < dt.date.today()]
+    df = compact(df, INGEST_SCHEMA)
 
-    pic = []
-
-    for i, r in enumerate(repos):
-        # convert series to a dataframe
-        c_df = pd.DataFrame(df.loc[df["created"] == r]).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
-
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
-
-        # move head of buffer to the beginning
-        b.seek(0)
-
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+    # split the results per repo in one pass, the slices
+    # are serialized by the cache manager.
+    pic = partition(df, repos)
 
     del df
 
@@ -3,8 +3,7 @@ import pandas as pd
 from db_manager.augur_manager import AugurManager
 from app import celery_app
 from cache_manager.cache_manager import CacheManager as cm
-import io
-import datetime as dt
+from queries.query_utils import partition, compact, DAY, CATEGORY, QueryTask
 from sqlalchemy.exc import SQLAlchemyError
 
 """
@@ -21,9 +20,20 @@ TODO:
 
 QUERY_NAME = "ttfr"
 
+# types the results are stored as, see query_utils.compact.
+INGEST_SCHEMA = {
+    "cntrb_id": CATEGORY,
+    "created": DAY,
+    "login": CATEGORY,
+    "action": CATEGORY,
+    "cntrb_company": CATEGORY,
+    "email_list": CATEGORY,
+}
+
 
 @celery_app.task(
     bind=True,
+    base=QueryTask,
     autoretry_for=(Exception,),
     exponential_backoff=2,
     retry_kwargs={"max_retries": 5},
@@ -47,7 +57,7 @@ def ttfr_query(self, repos):
     if len(repos) == 0:
         return None
 
-    query_string = f"""
+    query_string = """
                     SELECT
                         c.cntrb_id,
                         c.created_at AS created,
@@ -64,7 +74,7 @@ def ttfr_query(self, repos):
                     JOIN contributors con
                         ON c.cntrb_id = con.cntrb_id
                     WHERE
-                        c.repo_id in({str(repos)[1:-1]})
+                        c.repo_id = ANY(:repo_ids)
                     GROUP BY c.cntrb_id, c.created_at, c.repo_id, c.login, c.action, c.rank, con.cntrb_company
                 """
 
@@ -80,7 +90,7 @@ def ttfr_query(self, repos):
         # allow retry via Celery rules.
         raise SQLAlchemyError("DBConnect failed")
 
-    df = dbm.run_query(query_string)
+    df = dbm.run_query(query_string, params={"repo_ids": repos})
 
     # pandas column and format updates
     df["cntrb_id"] = df["cntrb_id"].astype(str)  # contributor ids to strings
@@ -90,27 +100,12 @@ def ttfr_query(self, repos):
     df = df.reset_index(drop=True)
     
     # change to compatible type and remove all data that has been incorrectly formated
-    df["created"] = pd.to_datetime(df["created"], utc=True).dt.date
-    df = df[df.created < dt.date.today()]
-
-    pic = []
-
-    for i, r in enumerate(repos):
-        # convert series to a dataframe
-        c_df = pd.DataFrame(df.loc[df["id"] == r]).reset_index(drop=True)
-
-        # bytes buffer to be written to
-        b = io.BytesIO()
-
-        # write dataframe in feather format to BytesIO buffer
-        bs = c_df.to_feather(b)
-
-        # move head of buffer to the beginning
-        b.seek(0)
+    df = compact(df, INGEST_SCHEMA)
+    df = df[df.created < pd.Timestamp.now(tz="UTC").normalize()]
 
-        # write the bytes of the buffer into the array
-        bs = b.read()
-        pic.append(bs)
+    # split the results per repo in one pass, the slices
+    # are serialized by the cache manager.
+    pic = partition(df, repos)
 
     del df
 
@@ -2,12 +2,11 @@ import logging
 from app import celery_app, augur
 import pandas as pd
 from cache_manager.cache_manager import CacheManager as cm
+from cache_manager.connections import users_client
 import io
 import datetime as dt
 from sqlalchemy.exc import SQLAlchemyError
-import redis
 import json
-import os
 
 QUERY_NAME = "USER_GROUPS_QUERY"
 
@@ -32,21 +31,15 @@ def user_groups_query(self, user_id):
     """
     logging.warning(f"{QUERY_NAME}_DATA_QUERY - START")
 
-    users_cache = redis.StrictRedis(
-        host=os.getenv("REDIS_SERVICE_USERS_HOST", "redis-users"),
-        port=6379,
-        password=os.getenv("REDIS_PASSWORD", ""),
-    )
+    users_cache = users_client()
 
-    # checks connection to Redis, raises redis.exceptions.ConnectionError if connection fails.
-    # returns True if connection succeeds.
-    users_cache.ping()
-
-    # check if user is in sessions
-    if not users_cache.exists(user_id):
+    # check if user is in sessions, the first command on the connection;
+    # raises redis.exceptions.ConnectionError if users-cache can't be reached.
+    user = users_cache.get(user_id)
+    if user is None:
         raise Exception("Expected user data under user_id not in cache.")
     else:
-        user = json.loads(users_cache.get(user_id))
+        user = json.loads(user)
 
     # query groups and options from Augur
     users_groups, users_options = get_user_groups(user["username"], user["access_token"])
@@ -0,0 +1,128 @@
+import logging
+import os
+from celery.utils import uuid
+from app import celery_app, augur
+from _celery import BULK_QUEUE
+from cache_manager.cache_manager import CacheManager as cm
+
+QUERY_NAME = "WARM"
+
+# number of most searched for repos and orgs whose results are kept warm.
+WARM_TOP_N = int(os.getenv("CACHE_WARM_TOP_N", "20"))
+
+# query tasks the warmer runs at the same time, leaving the rest of the query workers to users.
+WARM_CONCURRENCY = int(os.getenv("CACHE_WARM_CONCURRENCY", "2"))
+
+# number of repos fetched by one query task.
+WARM_BATCH = int(os.getenv("CACHE_WARM_BATCH", "50"))
+
+# seconds between checks of whether the query tasks started by the warmer finished.
+WARM_POLL = 30
+
+
+@celery_app.task(
+    bind=True,
+)
+def warm_query(self, jobs=None, running=None):
+    """
+    (Worker Query)
+    Loads the results of every query for the most searched for repos
+    and orgs that aren't cached, e.g. after redis-cache restarted.
+
+    At most WARM_CONCURRENCY of the query tasks it starts run at once.
+    Rather than waiting on them, it starts as many as are free to run and
+    schedules itself to start the rest once some have finished. Repos that
+    another task is already fetching, or that were cached in the meantime,
+    are skipped.
+
+    Args:
+    -----
+        jobs ([[str, [int]]]): query function name and repos of each query task left to start,
+            None when warming starts.
+        running ([str]): ids of the query tasks started that may not have finished.
+
+    Returns:
+    --------
+        int: number of query tasks started
+    """
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - START")
+
+    # imported here, the queries are listed by the module that imports this one.
+    from pages.index.index_callbacks import QUERIES
+
+    cache = cm()
+
+    if jobs is None:
+        jobs = _warm_jobs(cache, QUERIES)
+
+        # searches since the last warming count the most.
+        cache.decay_popularity()
+
+    queries = {f.__name__: f for f in QUERIES}
+
+    # finished tasks free up their place.
+    unfinished = []
+    for task_id in running or []:
+        result = celery_app.AsyncResult(task_id)
+        if result.ready():
+            result.forget()
+        else:
+            unfinished.append(task_id)
+
+    started = 0
+    while jobs and len(unfinished) < WARM_CONCURRENCY:
+        name, batch = jobs.pop(0)
+        f = queries[name]
+
+        batch = cache.missingm([f], batch)[f]
+        if not batch:
+            continue
+
+        # leases are taken right before the job starts, so that users
+        # searching for these repos in the meantime fetch them themselves.
+        task_id = uuid()
+        leased, _ = cache.leasem(f, batch, owner=task_id)
+        if not leased:
+            continue
+
+        f.apply_async(args=[leased], queue=BULK_QUEUE, task_id=task_id)
+        unfinished.append(task_id)
+        started += 1
+
+    if jobs:
+        # passed as kwargs, so its jobs aren't taken for repos whose leases are released when it finishes.
+        warm_query.apply_async(kwargs={"jobs": jobs, "running": unfinished}, queue=BULK_QUEUE, countdown=WARM_POLL)
+
+    logging.warning(f"{QUERY_NAME}_DATA_QUERY - END")
+    return started
+
+
+def _warm_jobs(cache, queries):
+    """
+    (private)
+    Query tasks that load the uncached results of the most popular repos and orgs.
+
+    Args:
+    -----
+        cache (CacheManager): results cache
+        queries ([function]): query functions whose results are loaded
+
+    Returns:
+    --------
+        [[str, [int]]]: query function name and repos of each query task.
+    """
+    top_repos, top_orgs = cache.popular(WARM_TOP_N)
+
+    # repos of the most popular selections first, each only once.
+    repos = list(top_repos)
+    for o in top_orgs:
+        if augur.is_org(o):
+            repos += augur.org_to_repos(o)
+    repos = list(dict.fromkeys(repos))
+
+    missing = cache.missingm(queries, repos, promote=True)
+
+    return [
+        [f.__name__, missing[f][i : i + WARM_BATCH]] for f in queries for i in range(0, len(missing[f]), WARM_BATCH)
+    ]
+
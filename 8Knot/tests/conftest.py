@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the app's modules are imported from the 8Knot directory, as the workers do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+import contextlib
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from db_manager import augur_manager
+from db_manager.augur_manager import AugurManager
+
+
+class Recorder:
+    """
+    Stands in for a pooled connection, keeping the statements as psycopg2
+    would send them, i.e. with their parameters rendered in, and the data
+    sent by COPY FROM STDIN apart from them.
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self.info = {}
+
+    @property
+    def connection(self):
+        return self
+
+    def cursor(self):
+        return self
+
+    def close(self):
+        pass
+
+    def execute(self, sql, params=None):
+        if params:
+            sql = sql % {k: psycopg2.extensions.adapt(v).getquoted().decode("utf-8") for k, v in params.items()}
+        self.statements.append(sql)
+        return self
+
+    def copy_expert(self, sql, file):
+        self.statements.append(sql)
+        self.copied.append(file.read())
+
+    def execution_options(self, **kwargs):
+        return self
+
+    def exec_driver_sql(self, sql, params=None):
+        return self.execute(sql, params)
+
+    def fetchall(self):
+        return []
+
+    def keys(self):
+        return ["repo_id"]
+
+
+class Engine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextlib.contextmanager
+    def connect(self):
+        yield self.conn
+
+
+def test_run_query_repo_ids_are_not_in_the_statement(monkeypatch):
+    monkeypatch.setattr(augur_manager, "PREPARE_STATEMENTS", True)
+    conn = Recorder()
+    dbm = AugurManager.__new__(AugurManager)
+    dbm.engine = Engine(conn)
+    repos = list(range(900001, 900401))
+
+    for _ in range(2):
+        dbm.run_query("SELECT r.repo_id FROM repo r WHERE r.repo_id = ANY(:repo_ids) AND r.repo_name = :name", params={"repo_ids": repos, "name": "x"})
+
+    assert not any(str(r) in s for s in conn.statements for r in repos)
+    assert conn.copied == ["".join(f"{r}\n" for r in repos)] * 2
+
+    # prepared once, then executed with only the scalar parameter.
+    assert sum(s.startswith("PREPARE") for s in conn.statements) == 1
+    executes = [s for s in conn.statements if s.startswith("EXECUTE")]
+    assert len(executes) == 2 and executes[0] == executes[1]
+    assert executes[0].endswith("('x')")
@@ -0,0 +1,83 @@
+import time
+import pandas as pd
+import pytest
+import cache_manager.cache_manager as ccm
+from cache_manager import codec
+from cache_manager.local_cache import local_cache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def commits_query(repos):
+    pass
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # results over 1MB are chunked.
+    monkeypatch.setattr(ccm, "CHUNK_MB", 1)
+    monkeypatch.setattr(local_cache, "max_bytes", 0)
+    c = ccm.CacheManager()
+    c._redis = fakeredis.FakeStrictRedis()
+    return c
+
+
+def frame(value, rows=300000):
+    return pd.DataFrame({"id": [1] * rows, "x": [value] * rows})
+
+
+def test_read_of_chunked_entry_rewritten_meanwhile_sees_one_write(cache, monkeypatch):
+    cache.setm(func=commits_query, repos=[1], datas=[frame(1)])
+    h = cache._get_hash(commits_query, 1)
+    assert codec.decode_manifest(cache._redis.get(h))["chunks"] > 1
+
+    read_chunks = cache._read_chunks
+
+    def rewrite_then_read(h, manifest, columns=None):
+        # the entry is rewritten after the reader fetched its manifest.
+        monkeypatch.setattr(cache, "_read_chunks", read_chunks)
+        cache.setm(func=commits_query, repos=[1], datas=[frame(2, rows=200000)])
+        return read_chunks(h, manifest, columns)
+
+    monkeypatch.setattr(cache, "_read_chunks", rewrite_then_read)
+
+    df = cache.grabm(func=commits_query, repos=[1])
+    assert len(df) == 300000
+    assert set(df["x"]) == {1}
+
+    df = cache.grabm(func=commits_query, repos=[1])
+    assert len(df) == 200000
+    assert set(df["x"]) == {2}
+
+
+def test_chunks_of_overwritten_entry_expire(cache, monkeypatch):
+    monkeypatch.setattr(ccm, "CHUNK_GRACE", 1)
+
+    cache.setm(func=commits_query, repos=[1], datas=[frame(1)])
+    h = cache._get_hash(commits_query, 1)
+    old = codec.decode_manifest(cache._redis.get(h))
+
+    cache.setm(func=commits_query, repos=[1], datas=[frame(2, rows=10)])
+    assert cache._read_chunks(h, old) is not None
+
+    time.sleep(1.1)
+    assert cache._read_chunks(h, old) is None
+    assert cache._redis.keys(f"{h}:chunk:*") == []
+
+
+def test_recorded_stamps_are_those_of_the_results_read(cache):
+    cache.setm(func=commits_query, repos=[1, 2], datas=[frame(1, rows=10), frame(1, rows=10)])
+
+    with cache.recording() as reads:
+        df = cache.grabm(func=commits_query, repos=[1, 2])
+    read = cache.recorded_stampsm(reads, [commits_query], [1, 2])
+    assert read == cache.stampsm([commits_query], [1, 2])
+
+    # rewritten after it was read, the figure of 'df' still belongs to the old stamps.
+    cache.setm(func=commits_query, repos=[1], datas=[frame(2, rows=10)])
+    assert set(df["x"]) == {1}
+    assert cache.recorded_stampsm(reads, [commits_query], [1, 2]) == read
+    assert cache.stampsm([commits_query], [1, 2])[0] != read[0]
+
+    # results that weren't read have no recorded stamps.
+    assert cache.recorded_stampsm(reads, [commits_query], [1, 3]) is None
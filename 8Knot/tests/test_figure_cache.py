@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+import cache_manager.cache_manager as ccm
+import cache_manager.figure_cache as figure_cache
+from cache_manager.local_cache import local_cache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def commits_query(repos):
+    pass
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(local_cache, "max_bytes", 0)
+    c = ccm.CacheManager()
+    c._redis = fakeredis.FakeStrictRedis()
+    monkeypatch.setattr(figure_cache, "cm", lambda: c)
+    return c
+
+
+def test_figure_of_results_rewritten_while_rendering_isnt_served_as_current(cache):
+    renders = []
+
+    @figure_cache.memoize_figure("test-viz", queries=[commits_query])
+    def viz(repolist):
+        if not renders:
+            # the results arrive while the callback waits for them...
+            cache.setm(func=commits_query, repos=[1], datas=[pd.DataFrame({"x": [1]})])
+        df = cache.grabm(func=commits_query, repos=repolist)
+        if not renders:
+            # ...and e.g. a refresh rewrites them after they were read.
+            cache.setm(func=commits_query, repos=[1], datas=[pd.DataFrame({"x": [2]})])
+        renders.append(int(df["x"][0]))
+        return {"layout": {"title": {"text": str(renders[-1])}}}
+
+    assert viz([1])["layout"]["title"]["text"] == "1"
+    assert viz([1])["layout"]["title"]["text"] == "2"
+    assert viz([1])["layout"]["title"]["text"] == "2"
+    assert renders == [1, 2]
@@ -0,0 +1,29 @@
+import pandas as pd
+from cache_manager import codec
+from queries.query_utils import compact, DAY, TIMESTAMP, CATEGORY
+
+
+def test_compact_timestamp_keeps_time_of_day():
+    df = pd.DataFrame({"author_timestamp": ["2023-05-01 13:45:00+02:00", "2023-05-02 23:10:00+00:00"]})
+
+    df = compact(df, {"author_timestamp": TIMESTAMP})
+
+    assert list(df["author_timestamp"].dt.hour) == [11, 23]
+    assert list(df["author_timestamp"].dt.minute) == [45, 10]
+
+
+def test_compact_timestamp_hour_survives_the_cache():
+    df = pd.DataFrame({"author_timestamp": ["2023-05-01 13:45:00+00:00"], "date": ["2023-05-01 13:45:00+00:00"]})
+
+    df = compact(df, {"author_timestamp": TIMESTAMP, "date": DAY})
+    df = codec.decode(codec.encode(df)).to_pandas()
+
+    assert list(df["author_timestamp"].dt.hour) == [13]
+    assert list(df["date"].dt.hour) == [0]
+
+
+def test_compact_category():
+    df = compact(pd.DataFrame({"login": ["a", "b", "a"]}), {"login": CATEGORY})
+
+    assert df["login"].dtype == "category"
+    assert list(df["login"]) == ["a", "b", "a"]